@@ -1,33 +1,166 @@
+from array import array
 import pygame
 
+FRAME_RATE = 60  # frame_duration is counted in ticks at this rate
+
 class Animation:
-    def __init__(self, frames, frame_duration, loop=True):
+    def __init__(self, frames, frame_duration, loop=True, mirrored=None):
         self.frames = frames
+        # Horizontally flipped frames, built once instead of on every draw
+        if mirrored is None:
+            mirrored = [pygame.transform.flip(frame, True, False) for frame in frames]
+        self.mirrored = mirrored
         self.frame_duration = frame_duration
         self.loop = loop
-        self.current_frame_index = 0  # Renamed for clarity
-        self.timer = 0
-        self.done = False
-    
-    def update(self):
-        if not self.done:
-            self.timer += 1
-            if self.timer >= self.frame_duration:
-                self.timer = 0
-                self.current_frame_index += 1
-                if self.current_frame_index >= len(self.frames):
+        # Playback state lives here until an AnimationManager takes it over
+        self.manager = None
+        self.slot = -1
+        self._index = 0
+        self._timer = 0
+        self._done = False
+
+    def update(self, dt=None):
+        """Advance by dt seconds, or by one tick when dt is None.
+
+        A managed animation is only queued here; its manager advances every
+        queued animation in one pass.
+        """
+        if self.manager is not None:
+            self.manager.pending.append(self.slot)
+            return
+        if not self._done:
+            self._timer += 1 if dt is None else dt * FRAME_RATE
+            while self._timer >= self.frame_duration and not self._done:
+                self._timer -= self.frame_duration
+                self._index += 1
+                if self._index >= len(self.frames):
                     if self.loop:
-                        self.current_frame_index = 0
+                        self._index = 0
                     else:
-                        self.current_frame_index = len(self.frames) - 1
-                        self.done = True
-    
+                        self._index = len(self.frames) - 1
+                        self._done = True
+
+    @property
+    def current_frame_index(self):
+        if self.manager is not None:
+            return self.manager.indices[self.slot]
+        return self._index
+
+    @property
+    def timer(self):
+        if self.manager is not None:
+            return self.manager.timers[self.slot]
+        return self._timer
+
+    @property
+    def done(self):
+        if self.manager is not None:
+            return self.manager.done[self.slot] == 1
+        return self._done
+
+    @property
+    def visible(self):
+        return self.manager is None or self.manager.visible[self.slot] == 1
+
+    @visible.setter
+    def visible(self, visible):
+        """Looping animations of off-screen entities are not advanced"""
+        if self.manager is not None:
+            self.manager.visible[self.slot] = visible
+
     @property
     def current_frame(self):
         """Property to get current frame surface"""
         return self.frames[self.current_frame_index]
-    
+
+    def frame(self, mirrored=False):
+        """Current frame, facing left when mirrored"""
+        frames = self.mirrored if mirrored else self.frames
+        return frames[self.current_frame_index]
+
     def reset(self):
-        self.current_frame_index = 0
-        self.timer = 0
-        self.done = False
\ No newline at end of file
+        if self.manager is not None:
+            self.manager.indices[self.slot] = 0
+            self.manager.timers[self.slot] = 0
+            self.manager.done[self.slot] = 0
+        self._index = 0
+        self._timer = 0
+        self._done = False
+
+class AnimationManager:
+    """Advances many animations from one clock in a single batched pass.
+
+    Timers and frame indices of registered animations are stored in flat
+    arrays indexed by slot. Animation.update() queues its slot, and
+    advance(dt) steps every queued animation by dt seconds, so playback
+    speed does not depend on how often frames are rendered.
+    """
+    def __init__(self):
+        self.animations = []
+        self.timers = array("d")
+        self.indices = array("i")
+        self.durations = array("d")
+        self.counts = array("i")
+        self.loops = bytearray()
+        self.done = bytearray()
+        self.visible = bytearray()
+        self.pending = []
+        self._free = []
+
+    def add(self, animation):
+        """Take over animation's playback state"""
+        if self._free:
+            slot = self._free.pop()
+            self.animations[slot] = animation
+        else:
+            slot = len(self.animations)
+            self.animations.append(animation)
+            for column in (self.timers, self.indices, self.durations, self.counts):
+                column.append(0)
+            for column in (self.loops, self.done, self.visible):
+                column.append(0)
+        self.timers[slot] = animation._timer
+        self.indices[slot] = animation._index
+        self.durations[slot] = animation.frame_duration
+        self.counts[slot] = len(animation.frames)
+        self.loops[slot] = animation.loop
+        self.done[slot] = animation._done
+        self.visible[slot] = 1
+        animation.manager = self
+        animation.slot = slot
+
+    def remove(self, animation):
+        """Hand the playback state back to animation and free its slot"""
+        slot = animation.slot
+        animation._timer = self.timers[slot]
+        animation._index = self.indices[slot]
+        animation._done = self.done[slot] == 1
+        animation.manager = None
+        animation.slot = -1
+        self.animations[slot] = None
+        self._free.append(slot)
+
+    def advance(self, dt):
+        """Step every queued animation by dt seconds"""
+        ticks = dt * FRAME_RATE
+        timers, indices, durations, counts = self.timers, self.indices, self.durations, self.counts
+        loops, done, visible = self.loops, self.done, self.visible
+        for slot in self.pending:
+            if done[slot] or (loops[slot] and not visible[slot]):
+                continue
+            timer = timers[slot] + ticks
+            duration = durations[slot]
+            if timer >= duration:
+                frames = int(timer // duration)
+                timer -= frames * duration
+                index = indices[slot] + frames
+                count = counts[slot]
+                if index >= count:
+                    if loops[slot]:
+                        index %= count
+                    else:
+                        index = count - 1
+                        done[slot] = 1
+                indices[slot] = index
+            timers[slot] = timer
+        self.pending.clear()
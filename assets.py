@@ -0,0 +1,119 @@
+import os
+import threading
+from collections import OrderedDict
+import pygame
+
+class AssetCache:
+    """Process-wide cache so each sprite and sound is decoded only once.
+
+    Images are shared between every Player and Enemy instance. When
+    memory_limit (bytes) is set, the least recently used images are dropped
+    from the cache; surfaces still held by entities stay valid.
+    """
+    def __init__(self, memory_limit=None):
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self._images = OrderedDict()  # path or variant key -> surface, oldest first
+        self._decoded = {}  # path -> surface decoded by preload(), not yet converted
+        self._sounds = {}
+        self._lock = threading.Lock()
+
+    def image(self, path):
+        """Surface for path, converted for fast blitting once a display exists"""
+        surface = self._images.get(path)
+        if surface is not None:
+            self._images.move_to_end(path)
+            return surface
+        with self._lock:
+            surface = self._decoded.pop(path, None)
+        if surface is None:
+            surface = pygame.image.load(path)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        self._images[path] = surface
+        self.memory_used += _surface_bytes(surface)
+        self._evict()
+        return surface
+
+    def variant(self, path, flip_x=False, scale=1, angle=0):
+        """Mirrored, scaled and/or rotated copy of an image, built once"""
+        if not flip_x and scale == 1 and angle == 0:
+            return self.image(path)
+        key = (path, flip_x, scale, angle)
+        surface = self._images.get(key)
+        if surface is not None:
+            self._images.move_to_end(key)
+            return surface
+        surface = self.image(path)
+        if flip_x:
+            surface = pygame.transform.flip(surface, True, False)
+        if scale != 1 or angle != 0:
+            surface = pygame.transform.rotozoom(surface, angle, scale)
+        self._images[key] = surface
+        self.memory_used += _surface_bytes(surface)
+        self._evict()
+        return surface
+
+    def frames(self, directory, count):
+        """Animation frames stored as 0.png .. (count-1).png in directory"""
+        return [self.image(os.path.join(directory, f"{i}.png")) for i in range(count)]
+
+    def sound(self, path, volume=None):
+        sound = self._sounds.get(path)
+        if sound is None:
+            sound = pygame.mixer.Sound(path)
+            if volume is not None:
+                sound.set_volume(volume)
+            self._sounds[path] = sound
+        return sound
+
+    def preload(self, *directories):
+        """Decode every PNG under the directories on a background thread.
+
+        Conversion happens on the main thread on first use. Returns the thread.
+        """
+        thread = threading.Thread(target=self.decode, args=directories, daemon=True)
+        thread.start()
+        return thread
+
+    def decode(self, *directories):
+        """Decode every PNG under the directories not decoded yet.
+
+        Safe to call from any thread; see preload().
+        """
+        paths = [
+            os.path.join(root, name)
+            for directory in directories
+            for root, _, names in os.walk(directory)
+            for name in sorted(names)
+            if name.endswith(".png")
+        ]
+        for path in paths:
+            if path in self._images or path in self._decoded:
+                continue
+            try:
+                surface = pygame.image.load(path)
+            except (pygame.error, FileNotFoundError):
+                continue  # Reported when the sprite is actually requested
+            with self._lock:
+                self._decoded[path] = surface
+
+    def _evict(self):
+        if self.memory_limit is None:
+            return
+        while self.memory_used > self.memory_limit and len(self._images) > 1:
+            _, surface = self._images.popitem(last=False)
+            self.memory_used -= _surface_bytes(surface)
+
+    def clear(self):
+        self._images.clear()
+        self._sounds.clear()
+        with self._lock:
+            self._decoded.clear()
+        self.memory_used = 0
+
+def _surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+# Shared by the whole game
+assets = AssetCache()
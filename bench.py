@@ -0,0 +1,190 @@
+"""Benchmarks for the game's hot paths on synthetic maps.
+
+    python bench.py [--sizes 200 1000] [--enemies 100] [--bullets 500] [--json results.json]
+
+Prints a table and optionally writes the results as JSON so runs can be
+compared against each other.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import pygame
+from session import GameSession, KeyState, init_headless, default_tile_kinds, TILE_SIZE
+from map import Map
+from soldier import Player
+from enemies import Enemy
+from bullet import BulletPool
+from collision import check_collision_with_walls
+from diamonds import DiamondField
+from mapfile import CHUNKED_EXTENSION, convert
+
+def write_synthetic_map(path, width, height, wall_density=0.2, seed=0):
+    """Write a random map in the start.map digit format: walled border,
+    scattered interior walls, start at the top left and end at the bottom right"""
+    rng = random.Random(seed)
+    rows = []
+    for y in range(height):
+        if y in (0, height - 1):
+            rows.append("1" * width)
+            continue
+        row = ["1"] + ["1" if rng.random() < wall_density else "0" for _ in range(width - 2)] + ["1"]
+        rows.append("".join(row))
+    # Start and end with open tiles beside them so they are never walled in
+    rows[1] = "120" + rows[1][3:]
+    rows[2] = "10" + rows[2][2:]
+    rows[height - 3] = rows[height - 3][:width - 2] + "01"
+    rows[height - 2] = rows[height - 2][:width - 3] + "031"
+    with open(path, "w") as file:
+        file.write("\n".join(rows))
+
+def floor_tiles(game_map, count, rng):
+    floors = [index for index, solid in enumerate(game_map.solid) if not solid]
+    return [divmod(index, game_map.width)[::-1] for index in rng.sample(floors, count)]
+
+def measure(function, number, repeat=3):
+    """Best mean time per call in microseconds over `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1e6
+
+def bench_size(size, map_path, enemy_count, bullet_count, screen):
+    rng = random.Random(size)
+    results = {}
+    results["map_load"] = measure(lambda: Map(map_path, default_tile_kinds(), TILE_SIZE), 1)
+    chunked_path = map_path.replace(".map", CHUNKED_EXTENSION)
+    convert(map_path, chunked_path)
+    results["map_load_chunked"] = measure(lambda: Map(chunked_path, default_tile_kinds(), TILE_SIZE).close(), 1)
+    game_map = Map(map_path, default_tile_kinds(), TILE_SIZE)
+
+    game_map.draw(screen)  # Render the visible chunks once
+    results["map_draw"] = measure(lambda: game_map.draw(screen), 200)
+
+    player = Player(game_map.start_pos[0], game_map.start_pos[1], TILE_SIZE)
+    enemies = [
+        Enemy(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, game_map, rng)
+        for x, y in floor_tiles(game_map, enemy_count, rng)
+    ]
+    goals = floor_tiles(game_map, 10, rng)
+
+    def find_path_new_goal():
+        x, y = goals[rng.randrange(len(goals))]
+        player.hitbox.center = (x * TILE_SIZE + TILE_SIZE // 2, y * TILE_SIZE + TILE_SIZE // 2)
+        enemies[0]._find_path(player)
+
+    results["find_path_new_goal"] = measure(find_path_new_goal, 5)
+    results["find_path_same_goal"] = measure(lambda: [enemy._find_path(player) for enemy in enemies], 20) / enemy_count
+
+    boxes = [
+        pygame.Rect(x * TILE_SIZE + 4, y * TILE_SIZE + 4, 16, 21)
+        for x, y in floor_tiles(game_map, 1000, rng)
+    ]
+    results["diamond_scatter"] = measure(lambda: DiamondField.scatter(game_map, TILE_SIZE, 0.15, rng), 1)
+    diamonds = DiamondField.scatter(game_map, TILE_SIZE, 0.15, rng)
+    hitboxes = [pygame.Rect(x * TILE_SIZE + 8, y * TILE_SIZE + 5, 16, 21) for x, y in floor_tiles(game_map, 1000, rng)]
+    results["diamond_pickup"] = measure(lambda: [diamonds.collect(hitbox) for hitbox in hitboxes], 1) / len(hitboxes)
+
+    results["wall_collision"] = measure(lambda: [check_collision_with_walls(box, game_map) for box in boxes], 20) / len(boxes)
+
+    x, y = game_map.start_pos
+    player.hitbox.topleft = (x + 8, y + 5)
+    moves = [(rng.choice((-4, 0, 4)), rng.choice((-4, 0, 4))) for _ in range(1000)]
+    results["player_move"] = measure(lambda: [player._move(dx, dy, game_map) for dx, dy in moves], 20) / len(moves)
+
+    def bullet_updates():
+        bullets = BulletPool(TILE_SIZE)
+        for x, y in floor_tiles(game_map, bullet_count, rng):
+            bullets.spawn(x * TILE_SIZE + 16, y * TILE_SIZE + 16, *rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1))))
+        started = time.perf_counter()
+        bullets.update(game_map)
+        return time.perf_counter() - started
+
+    results["bullet_update"] = min(bullet_updates() for _ in range(5)) / bullet_count * 1e6
+
+    enemy_tiles = floor_tiles(game_map, enemy_count, rng)
+    bullet_shots = [(x * TILE_SIZE + 16, y * TILE_SIZE + 16) + rng.choice(((1, 0), (-1, 0), (0, 1), (0, -1)))
+                    for x, y in floor_tiles(game_map, bullet_count, rng)]
+    policy_keys = [
+        KeyState(key for key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+                 if rng.random() < 0.4)
+        for _ in range(64)
+    ]
+
+    def start_session(**options):
+        session = GameSession(map_path, enemy_tiles=enemy_tiles, sound=False, seed=size, **options)
+        # Keep the game running, and all its enemies alive, for the whole benchmark
+        session.player.health = float("inf")
+        for enemy in session.enemies:
+            enemy.health = 2 ** 31 - 1
+        return session
+
+    def time_ticks(session, number):
+        """Seconds taken by each of number ticks (step and draw), with the
+        player's bullets topped up to bullet_count before each one"""
+        times = []
+        for _ in range(number):
+            bullets = session.player.bullets
+            for shot in bullet_shots[len(bullets):]:
+                bullets.spawn(*shot)
+            started = time.perf_counter()
+            session.step(policy_keys[session.ticks % len(policy_keys)])
+            session.draw(screen)
+            times.append(time.perf_counter() - started)
+        return times
+
+    session = start_session()
+    results["session_tick"] = min(sum(time_ticks(session, 100)) / 100 for _ in range(3)) * 1e6
+    # Frame-time spikes: the slowest of 200 ticks
+    results["session_tick_worst"] = max(time_ticks(session, 200)) * 1e6
+    session.close()
+
+    # The same level with enemies out of the player's sight left dormant
+    session = start_session(dormancy=True)
+    results["session_tick_dormant"] = min(sum(time_ticks(session, 100)) / 100 for _ in range(3)) * 1e6
+    session.close()
+    return results
+
+def print_table(results):
+    names = list(next(iter(results.values())))
+    sizes = list(results)
+    print(f"{'benchmark (us/call)':<22}" + "".join(f"{size:>14}" for size in sizes))
+    for name in names:
+        print(f"{name:<22}" + "".join(f"{results[size][name]:>14.1f}" for size in sizes))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000],
+                        help="side length in tiles of each synthetic map")
+    parser.add_argument("--enemies", type=int, default=100)
+    parser.add_argument("--bullets", type=int, default=500)
+    parser.add_argument("--json", metavar="PATH", help="write machine-readable results here")
+    args = parser.parse_args()
+
+    screen = init_headless((640, 640))
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            map_path = os.path.join(directory, f"synthetic_{size}.map")
+            write_synthetic_map(map_path, size, size, seed=size)
+            results[f"{size}x{size}"] = bench_size(size, map_path, args.enemies, args.bullets, screen)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "pygame": pygame.version.ver,
+                "enemies": args.enemies,
+                "bullets": args.bullets,
+                "results_us": results,
+            }, file, indent=2)
+
+if __name__ == "__main__":
+    main()
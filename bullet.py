@@ -1,4 +1,21 @@
+from array import array
 import pygame
+from collision import move_and_collide, sweep_x, sweep_y
+
+_sprites = {}
+
+def bullet_sprite(size, color=(255, 255, 0)):
+    """Bullet square with its glow baked in, built once per size and color"""
+    sprite = _sprites.get((size, color))
+    if sprite is None:
+        sprite = pygame.Surface((size + 4, size + 4), pygame.SRCALPHA)
+        pygame.draw.rect(sprite, color, (2, 2, size, size))
+        # Optional: Add a glow effect
+        glow = pygame.Surface((size + 4, size + 4), pygame.SRCALPHA)
+        pygame.draw.circle(glow, (*color, 100), (size // 2 + 2, size // 2 + 2), size // 2 + 2)
+        sprite.blit(glow, (0, 0))
+        _sprites[(size, color)] = sprite
+    return sprite
 
 class Bullet:
     def __init__(self, x, y, direction_x, direction_y, tile_size):
@@ -20,13 +37,17 @@ class Bullet:
         if not self.active:
             return False
 
-        # Move bullet
-        self.hitbox.x += self.direction_x * self.speed
-        self.hitbox.y += self.direction_y * self.speed
+        # Move bullet, sweeping so it cannot pass through walls
+        hit_x, hit_y = move_and_collide(
+            self.hitbox,
+            self.direction_x * self.speed,
+            self.direction_y * self.speed,
+            game_map
+        )
         self.lifetime -= 1
 
         # Check wall collision
-        if self._check_wall_collision(game_map):
+        if hit_x or hit_y or self._check_wall_collision(game_map):
             self.active = False
             return False
 
@@ -38,28 +59,94 @@ class Bullet:
         return True
 
     def _check_wall_collision(self, game_map):
-        # Check map boundaries
-        if (self.hitbox.x < 0 or self.hitbox.x > len(game_map.tiles[0]) * game_map.tile_size or
-            self.hitbox.y < 0 or self.hitbox.y > len(game_map.tiles) * game_map.tile_size):
+        # Check map boundaries (walls are handled by the sweep)
+        if (self.hitbox.x < 0 or self.hitbox.x > game_map.width * game_map.tile_size or
+            self.hitbox.y < 0 or self.hitbox.y > game_map.height * game_map.tile_size):
             return True
-
-        # Check solid tiles
-        tile_x = self.hitbox.centerx // game_map.tile_size
-        tile_y = self.hitbox.centery // game_map.tile_size
-        
-        if (0 <= tile_y < len(game_map.tiles) and 
-            0 <= tile_x < len(game_map.tiles[0])):
-            if game_map.tile_kinds[game_map.tiles[tile_y][tile_x]].is_solid:
-                return True
-        
         return False
 
     def draw(self, screen):
         if self.active:
-            pygame.draw.rect(screen, self.color, self.hitbox)
-            # Optional: Add a glow effect
-            glow = pygame.Surface((self.size+4, self.size+4), pygame.SRCALPHA)
-            pygame.draw.circle(glow, (255, 255, 0, 100), 
-                             (self.size//2+2, self.size//2+2), 
-                             self.size//2+2)
-            screen.blit(glow, (self.hitbox.x-2, self.hitbox.y-2))
\ No newline at end of file
+            screen.blit(bullet_sprite(self.size, self.color), (self.hitbox.x - 2, self.hitbox.y - 2))
+
+class BulletPool:
+    """Struct-of-arrays storage for many bullets.
+
+    Live bullets are packed into slots [0, count) of preallocated arrays and
+    dead ones are swap-removed, so shooting allocates no objects and one
+    update() pass moves every bullet.
+    """
+    def __init__(self, tile_size, capacity=64):
+        self.size = tile_size // 4  # Slightly larger for visibility
+        self.color = (255, 255, 0)  # Yellow
+        self.speed = 8
+        self.lifetime = 60  # Frames before disappearing
+        self.count = 0
+        self.xs = array("i", bytes(4 * capacity))
+        self.ys = array("i", bytes(4 * capacity))
+        self.dxs = array("i", bytes(4 * capacity))
+        self.dys = array("i", bytes(4 * capacity))
+        self.lives = array("i", bytes(4 * capacity))
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, direction_x, direction_y):
+        """Add a bullet centred on (x, y)"""
+        if self.count == len(self.xs):
+            for column in (self.xs, self.ys, self.dxs, self.dys, self.lives):
+                column.extend(column)  # Double the capacity
+        slot = self.count
+        self.xs[slot] = x - self.size // 2  # Center the bullet
+        self.ys[slot] = y - self.size // 2
+        self.dxs[slot] = direction_x * self.speed
+        self.dys[slot] = direction_y * self.speed
+        self.lives[slot] = self.lifetime
+        self.count += 1
+
+    def kill(self, slot):
+        """Remove a bullet by moving the last one into its slot"""
+        last = self.count - 1
+        for column in (self.xs, self.ys, self.dxs, self.dys, self.lives):
+            column[slot] = column[last]
+        self.count = last
+
+    def rect(self, slot):
+        return (self.xs[slot], self.ys[slot], self.size, self.size)
+
+    def update(self, game_map):
+        """Move every bullet, removing those that hit a wall, leave the map
+        or run out of lifetime"""
+        xs, ys, dxs, dys, lives = self.xs, self.ys, self.dxs, self.dys, self.lives
+        size = self.size
+        max_x = game_map.width * game_map.tile_size
+        max_y = game_map.height * game_map.tile_size
+        # Walk backwards so swap-removal never skips a bullet
+        for slot in range(self.count - 1, -1, -1):
+            x, y = xs[slot], ys[slot]
+            dx, hit_x = sweep_x(x, y, x + size, y + size, dxs[slot], game_map)
+            x += dx
+            dy, hit_y = sweep_y(x, y, x + size, y + size, dys[slot], game_map)
+            y += dy
+            lives[slot] -= 1
+            if (hit_x or hit_y or lives[slot] <= 0 or
+                    x < 0 or x > max_x or y < 0 or y > max_y):
+                self.kill(slot)
+            else:
+                xs[slot] = x
+                ys[slot] = y
+
+    def draw(self, screen, offset=(0, 0), view=None):
+        """Blit the cached bullet sprite once per live bullet; returns the areas drawn.
+
+        Bullets outside view (a world-pixel rect) are skipped.
+        """
+        sprite = bullet_sprite(self.size, self.color)
+        xs, ys = self.xs, self.ys
+        offset_x, offset_y = offset
+        slots = range(self.count)
+        if view is not None:
+            left, top = view.left - self.size - 2, view.top - self.size - 2
+            right, bottom = view.right + 2, view.bottom + 2
+            slots = [slot for slot in slots if left < xs[slot] < right and top < ys[slot] < bottom]
+        return screen.blits([(sprite, (xs[slot] - 2 - offset_x, ys[slot] - 2 - offset_y)) for slot in slots])
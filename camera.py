@@ -0,0 +1,25 @@
+import pygame
+
+class Camera:
+    """Scrolling viewport over the world, in world pixels.
+
+    rect.topleft is the world position shown at the screen's top-left
+    corner, which is the offset every draw call subtracts.
+    """
+    def __init__(self, view_width, view_height, world_width, world_height):
+        self.rect = pygame.Rect(0, 0, view_width, view_height)
+        self.world_width = world_width
+        self.world_height = world_height
+
+    @property
+    def offset(self):
+        return self.rect.topleft
+
+    def follow(self, target):
+        """Centre on target, without showing anything past the map edges"""
+        self.rect.center = target.center
+        self.rect.x = max(0, min(self.rect.x, self.world_width - self.rect.width))
+        self.rect.y = max(0, min(self.rect.y, self.world_height - self.rect.height))
+
+    def visible(self, rect):
+        return self.rect.colliderect(rect)
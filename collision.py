@@ -1,55 +1,138 @@
 import pygame
 
+# Tile collision engine. Boxes are plain (left, top, right, bottom) pixel
+# edges, right/bottom exclusive like pygame.Rect, and walls come from the
+# map's solidity mask, so no Rect is allocated per candidate tile.
+
 def check_collision_rects(rect1, rect2):
     """Simple collision check between two rectangles."""
     return rect1.colliderect(rect2)
 
-def check_collision_with_walls(hitbox, game_map, tile_size):
-    """Checks if a given hitbox collides with any solid wall (optimized)."""
-    start_x = max(0, hitbox.left // tile_size - 1)
-    end_x = min(len(game_map.tiles[0]), (hitbox.right // tile_size) + 1)
-    start_y = max(0, hitbox.top // tile_size - 1)
-    end_y = min(len(game_map.tiles), (hitbox.bottom // tile_size) + 1)
-
-    for y in range(start_y, end_y):
-        for x in range(start_x, end_x):
-            tile_kind = game_map.tile_kinds[game_map.tiles[y][x]]
-            if tile_kind.is_solid:
-                wall_rect = pygame.Rect(
-                    x * tile_size,
-                    y * tile_size,
-                    tile_size,
-                    tile_size
-                )
-                if hitbox.colliderect(wall_rect):
-                    return True
+def _tile_range(low, high, tile_size, limit):
+    """Range of tile indices covered by the pixel span [low, high)"""
+    return range(max(0, low // tile_size), min(limit, (high - 1) // tile_size + 1))
+
+def box_hits_wall(left, top, right, bottom, game_map):
+    """True if the box overlaps any solid tile."""
+    tile_size = game_map.tile_size
+    width = game_map.width
+    solid = game_map.solid
+    columns = _tile_range(left, right, tile_size, width)
+    for y in _tile_range(top, bottom, tile_size, game_map.height):
+        row = y * width
+        for x in columns:
+            if solid[row + x]:
+                return True
+    return False
+
+def wall_spans(left, top, right, bottom, game_map):
+    """Solid tiles overlapping the box, merged into horizontal runs.
+
+    Each run is returned as a (left, top, right, bottom) pixel tuple.
+    """
+    tile_size = game_map.tile_size
+    width = game_map.width
+    solid = game_map.solid
+    columns = _tile_range(left, right, tile_size, width)
+    spans = []
+    for y in _tile_range(top, bottom, tile_size, game_map.height):
+        row = y * width
+        run_start = None
+        for x in columns:
+            if solid[row + x]:
+                if run_start is None:
+                    run_start = x
+            elif run_start is not None:
+                spans.append((run_start * tile_size, y * tile_size, x * tile_size, (y + 1) * tile_size))
+                run_start = None
+        if run_start is not None:
+            spans.append((run_start * tile_size, y * tile_size,
+                          columns.stop * tile_size, (y + 1) * tile_size))
+    return spans
+
+def _column_blocked(x, rows, game_map):
+    if not 0 <= x < game_map.width:
+        return False
+    solid = game_map.solid
+    width = game_map.width
+    for y in rows:
+        if solid[y * width + x]:
+            return True
+    return False
+
+def _row_blocked(y, columns, game_map):
+    if not 0 <= y < game_map.height:
+        return False
+    solid = game_map.solid
+    row = y * game_map.width
+    for x in columns:
+        if solid[row + x]:
+            return True
     return False
 
-def get_colliding_walls(hitbox, game_map, tile_size):
-    """Returns a list of walls currently colliding with a hitbox (optimized)."""
-    walls = []
-    start_x = max(0, hitbox.left // tile_size - 1)
-    end_x = min(len(game_map.tiles[0]), (hitbox.right // tile_size) + 1)
-    start_y = max(0, hitbox.top // tile_size - 1)
-    end_y = min(len(game_map.tiles), (hitbox.bottom // tile_size) + 1)
-
-    for y in range(start_y, end_y):
-        for x in range(start_x, end_x):
-            tile_kind = game_map.tile_kinds[game_map.tiles[y][x]]
-            if tile_kind.is_solid:
-                wall_rect = pygame.Rect(
-                    x * tile_size,
-                    y * tile_size,
-                    tile_size,
-                    tile_size
-                )
-                if hitbox.colliderect(wall_rect):
-                    walls.append(wall_rect)
-    return walls
-
-def check_collision_with_enemies(player_hitbox, enemies):
-    """Checks if the player collides with any enemy in the list."""
+def sweep_x(left, top, right, bottom, dx, game_map):
+    """Continuous horizontal move: (allowed dx, hit wall).
+
+    Every column crossed by the leading edge is checked, so fast boxes
+    cannot tunnel through thin walls.
+    """
+    tile_size = game_map.tile_size
+    rows = _tile_range(top, bottom, tile_size, game_map.height)
+    if dx > 0:
+        for x in range((right - 1) // tile_size + 1, (right + dx - 1) // tile_size + 1):
+            if _column_blocked(x, rows, game_map):
+                return x * tile_size - right, True
+    elif dx < 0:
+        for x in range(left // tile_size - 1, (left + dx) // tile_size - 1, -1):
+            if _column_blocked(x, rows, game_map):
+                return (x + 1) * tile_size - left, True
+    return dx, False
+
+def sweep_y(left, top, right, bottom, dy, game_map):
+    """Continuous vertical move: (allowed dy, hit wall)."""
+    tile_size = game_map.tile_size
+    columns = _tile_range(left, right, tile_size, game_map.width)
+    if dy > 0:
+        for y in range((bottom - 1) // tile_size + 1, (bottom + dy - 1) // tile_size + 1):
+            if _row_blocked(y, columns, game_map):
+                return y * tile_size - bottom, True
+    elif dy < 0:
+        for y in range(top // tile_size - 1, (top + dy) // tile_size - 1, -1):
+            if _row_blocked(y, columns, game_map):
+                return (y + 1) * tile_size - top, True
+    return dy, False
+
+def move_and_collide(hitbox, dx, dy, game_map):
+    """Move a Rect by (dx, dy), x axis first, stopping flush against walls.
+
+    Returns (hit_x, hit_y) telling which axes were blocked.
+    """
+    dx, hit_x = sweep_x(hitbox.left, hitbox.top, hitbox.right, hitbox.bottom, int(dx), game_map)
+    hitbox.x += dx
+    dy, hit_y = sweep_y(hitbox.left, hitbox.top, hitbox.right, hitbox.bottom, int(dy), game_map)
+    hitbox.y += dy
+    return hit_x, hit_y
+
+def check_collision_with_walls(hitbox, game_map, tile_size=None):
+    """Checks if a given hitbox collides with any solid wall."""
+    return box_hits_wall(hitbox.left, hitbox.top, hitbox.right, hitbox.bottom, game_map)
+
+def get_colliding_walls(hitbox, game_map, tile_size=None):
+    """Returns the merged wall spans currently colliding with a hitbox."""
+    return [
+        pygame.Rect(left, top, right - left, bottom - top)
+        for left, top, right, bottom in wall_spans(
+            hitbox.left, hitbox.top, hitbox.right, hitbox.bottom, game_map)
+    ]
+
+def check_collision_with_enemies(player_hitbox, enemies, grid=None):
+    """Checks if the player collides with any enemy in the list.
+
+    When a SpatialHash of the enemies is given, only nearby ones are tested.
+    """
+    if grid is not None:
+        enemies = grid.query(player_hitbox)
     for enemy in enemies:
         if player_hitbox.colliderect(enemy.hitbox):
             return enemy
-    return None
\ No newline at end of file
+    return None
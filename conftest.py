@@ -0,0 +1,12 @@
+import os
+import pytest
+
+# Tests import the game's top-level modules; pygame needs no window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+@pytest.fixture(scope="session")
+def headless():
+    """pygame initialised with a tiny display, as sprites need convert_alpha()"""
+    from session import init_headless
+    return init_headless()
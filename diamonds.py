@@ -1,5 +1,11 @@
 import pygame
 import random
+from collections import OrderedDict
+from itertools import compress
+from map import CHUNK_SIZE, RENDER_CACHE_CHUNKS, STREAM_RADIUS
+
+FLOOR_TILES = bytes.maketrans(b"\0\1", b"\1\0")  # Solidity mask -> 1 on floor tiles
+_TRANSPARENT = (255, 0, 255)  # Colour key of the diamond layer
 
 class Diamond:
     def __init__(self, grid_x, grid_y, tile_size):
@@ -16,17 +22,193 @@ class Diamond:
         self.color = (0, 255, 255)  # Cyan vif
         self.collected = False
 
-    def draw(self, screen):
+    def draw(self, screen, offset=(0, 0)):
         if not self.collected:
-            pygame.draw.rect(screen, self.color, self.rect)
+            return pygame.draw.rect(screen, self.color, self.rect.move(-offset[0], -offset[1]))
 
-def generate_diamonds(game_map, tile_size, density=0.3):
-    """Génère des diamants sur les cases non-solides"""
+def generate_diamonds(game_map, tile_size, density=0.3, rng=random):
+    """Génère des diamants sur les cases non-solides (rng: random.Random seedé)"""
     diamonds = []
-    for y, row in enumerate(game_map.tiles):
-        for x, tile_index in enumerate(row):
-            # Vérifie si la case est un sol (non mur)
-            if not game_map.tile_kinds[tile_index].is_solid:
-                if random.random() < density:
-                    diamonds.append(Diamond(x, y, tile_size))
-    return diamonds
\ No newline at end of file
+    for index, solid in enumerate(game_map.solid):
+        # Vérifie si la case est un sol (non mur)
+        if not solid:
+            if rng.random() < density:
+                y, x = divmod(index, game_map.width)
+                diamonds.append(Diamond(x, y, tile_size))
+    return diamonds
+
+
+class DiamondField:
+    """Every diamond of a level, stored as a tile-indexed bitmap.
+
+    tiles[y * width + x] is 1 while a diamond lies centred on that tile, so
+    pickup only looks at the few tiles under the player, whatever the number
+    of diamonds. They are drawn from cached, colour-keyed chunk surfaces that
+    are patched when a diamond is collected.
+
+    On streamed maps the diamonds of each map chunk are only placed when
+    focus() first brings the player near it, so a level of any size starts
+    without reading its whole map; len() and indices() then cover the
+    chunks placed so far.
+    """
+    def __init__(self, width, height, tile_size, tiles=None):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.tiles = bytearray(width * height) if tiles is None else tiles
+        self.count = self.tiles.count(1)
+        self.size = tile_size // 4
+        self.color = (0, 255, 255)  # Cyan vif
+        self._chunks = OrderedDict()  # (chunk_x, chunk_y) -> surface of the chunk's diamonds, LRU
+        self._stream = None  # ChunkCache whose chunks are scattered lazily
+        self._density = 0.0
+        self._seed = 0
+        self._placed = set()  # Map chunks scattered so far
+        self._focus_chunk = None
+
+    @classmethod
+    def scatter(cls, game_map, tile_size, density=0.3, rng=random):
+        """Place diamonds on that fraction of the floor tiles, picked with
+        one rng.sample() call (rng: random.Random seedé).
+
+        Streamed maps draw one seed from rng instead; each map chunk is
+        scattered from it and its coordinates once focus() reaches it.
+        """
+        if game_map.stream is not None:
+            field = cls(game_map.width, game_map.height, tile_size)
+            field._stream = game_map.stream
+            field._density = density
+            field._seed = rng.getrandbits(32)
+            start_x, start_y = game_map.start_pos
+            field.focus(start_x // tile_size, start_y // tile_size)
+            return field
+        floor = bytes(game_map.solid).translate(FLOOR_TILES)
+        floors = list(compress(range(len(floor)), floor))
+        field = cls(game_map.width, game_map.height, tile_size)
+        for index in rng.sample(floors, round(density * len(floors))):
+            field.tiles[index] = 1
+        field.count = field.tiles.count(1)
+        return field
+
+    def focus(self, tile_x, tile_y):
+        """Scatter the map chunks the player's stream keeps loaded around a
+        tile; no-op for fields of in-memory maps"""
+        stream = self._stream
+        if stream is None:
+            return
+        source = stream.source
+        center = (tile_x // source.chunk_size, tile_y // source.chunk_size)
+        if center == self._focus_chunk:
+            return
+        self._focus_chunk = center
+        for chunk_y in range(max(0, center[1] - STREAM_RADIUS), min(source.chunks_y, center[1] + STREAM_RADIUS + 1)):
+            for chunk_x in range(max(0, center[0] - STREAM_RADIUS), min(source.chunks_x, center[0] + STREAM_RADIUS + 1)):
+                if (chunk_x, chunk_y) not in self._placed:
+                    self._scatter_chunk(chunk_x, chunk_y)
+
+    def _scatter_chunk(self, chunk_x, chunk_y):
+        self._placed.add((chunk_x, chunk_y))
+        size = self._stream.source.chunk_size
+        _, solid = self._stream.get((chunk_x, chunk_y))
+        first_x, first_y = chunk_x * size, chunk_y * size
+        columns = min(size, self.width - first_x)
+        floors = []
+        for row in range(min(size, self.height - first_y)):
+            # Chunks are padded past the map's edge; only real columns count
+            floor = bytes(solid[row * size:row * size + columns]).translate(FLOOR_TILES)
+            start = (first_y + row) * self.width + first_x
+            floors.extend(compress(range(start, start + columns), floor))
+        rng = random.Random((self._seed << 32) ^ (chunk_y << 16) ^ chunk_x)
+        placed = rng.sample(floors, round(self._density * len(floors)))
+        for index in placed:
+            self.tiles[index] = 1
+        self.count += len(placed)
+        # Surfaces rendered before these diamonds existed are out of date
+        for render_y in range(first_y // CHUNK_SIZE, (first_y + size - 1) // CHUNK_SIZE + 1):
+            for render_x in range(first_x // CHUNK_SIZE, (first_x + columns - 1) // CHUNK_SIZE + 1):
+                self._chunks.pop((render_x, render_y), None)
+
+    def __len__(self):
+        return self.count
+
+    def rect(self, index):
+        """Area of the diamond on tile index"""
+        y, x = divmod(index, self.width)
+        offset = (self.tile_size - self.size) // 2  # Centre de la tuile
+        return pygame.Rect(x * self.tile_size + offset, y * self.tile_size + offset, self.size, self.size)
+
+    def indices(self):
+        """Tile index of every diamond left, in map order"""
+        tiles = self.tiles
+        index = tiles.find(1)
+        while index >= 0:
+            yield index
+            index = tiles.find(1, index + 1)
+
+    def collect(self, hitbox):
+        """Remove the diamonds hitbox touches; returns their areas"""
+        tile_size = self.tile_size
+        collected = []
+        for y in range(max(0, hitbox.top // tile_size), min(self.height, (hitbox.bottom - 1) // tile_size + 1)):
+            for x in range(max(0, hitbox.left // tile_size), min(self.width, (hitbox.right - 1) // tile_size + 1)):
+                index = y * self.width + x
+                if self.tiles[index]:
+                    rect = self.rect(index)
+                    if hitbox.colliderect(rect):
+                        self.discard(index)
+                        collected.append(rect)
+        return collected
+
+    def discard(self, index):
+        """Remove the diamond on tile index, if there is one"""
+        if self.tiles[index]:
+            self.tiles[index] = 0
+            self.count -= 1
+            self._erase(self.rect(index))
+
+    def _erase(self, rect):
+        chunk_pixels = CHUNK_SIZE * self.tile_size
+        key = (rect.x // chunk_pixels, rect.y // chunk_pixels)
+        surface = self._chunks.get(key)
+        if surface is not None:
+            surface.fill(_TRANSPARENT, rect.move(-key[0] * chunk_pixels, -key[1] * chunk_pixels))
+
+    def _render_chunk(self, chunk_x, chunk_y):
+        first_x = chunk_x * CHUNK_SIZE
+        first_y = chunk_y * CHUNK_SIZE
+        columns = min(CHUNK_SIZE, self.width - first_x)
+        rows = min(CHUNK_SIZE, self.height - first_y)
+        surface = pygame.Surface((columns * self.tile_size, rows * self.tile_size))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(_TRANSPARENT)
+        surface.set_colorkey(_TRANSPARENT)
+        origin = (-first_x * self.tile_size, -first_y * self.tile_size)
+        for y in range(first_y, first_y + rows):
+            row = y * self.width
+            index = self.tiles.find(1, row + first_x, row + first_x + columns)
+            while index >= 0:
+                surface.fill(self.color, self.rect(index).move(origin))
+                index = self.tiles.find(1, index + 1, row + first_x + columns)
+        self._chunks[(chunk_x, chunk_y)] = surface
+        if len(self._chunks) > RENDER_CACHE_CHUNKS:
+            self._chunks.popitem(last=False)
+        return surface
+
+    def draw(self, screen, offset=(0, 0)):
+        """Blit the diamond layer's chunks that intersect the screen's clip area"""
+        offset_x, offset_y = offset
+        clip = screen.get_clip().move(offset_x, offset_y)
+        chunk_pixels = CHUNK_SIZE * self.tile_size
+        chunks_x = (self.width + CHUNK_SIZE - 1) // CHUNK_SIZE
+        chunks_y = (self.height + CHUNK_SIZE - 1) // CHUNK_SIZE
+        for chunk_y in range(max(0, clip.top // chunk_pixels),
+                             min(chunks_y, (clip.bottom - 1) // chunk_pixels + 1)):
+            for chunk_x in range(max(0, clip.left // chunk_pixels),
+                                 min(chunks_x, (clip.right - 1) // chunk_pixels + 1)):
+                surface = self._chunks.get((chunk_x, chunk_y))
+                if surface is None:
+                    surface = self._render_chunk(chunk_x, chunk_y)
+                else:
+                    self._chunks.move_to_end((chunk_x, chunk_y))
+                screen.blit(surface, (chunk_x * chunk_pixels - offset_x, chunk_y * chunk_pixels - offset_y))
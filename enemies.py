@@ -1,21 +1,23 @@
 import os
 import pygame
 import random
+from array import array
 from animation import Animation
-from queue import PriorityQueue
+from assets import assets
+from collision import box_hits_wall, check_collision_with_walls
+
+ALWAYS_AWAKE = 2 ** 31 - 1  # awake_until of enemies that never go dormant
 
 class Enemy:
-    def __init__(self, x, y, tile_size, game_map):
+    def __init__(self, x, y, tile_size, game_map, rng=random):
         self.tile_size = tile_size
         self.game_map = game_map
     
-        # Animation system
+        # Animation system; enemies are removed as soon as they die
         self.animations = {
-            "Run": self._load_animation("Run", 6, 8),
-            "Death": self._load_animation("Death", 8, 12, loop=False)
+            "Run": self._load_animation("Run", 6, 8)
         }
-        self.state = "Run"
-        self.current_anim = self.animations[self.state]
+        self.current_anim = self.animations["Run"]
     
         # Get sprite dimensions from first frame
         self.sprite_width, self.sprite_height = self.current_anim.current_frame.get_size()
@@ -33,20 +35,23 @@ class Enemy:
     
         # Enemy properties
         self.speed = 2
-        self.direction = random.choice([-1, 1])  # -1: left, 1: right
+        self.direction = rng.choice([-1, 1])  # -1: left, 1: right
         self.health = 1
         self.path = []
         self.path_update_timer = 0
         self.path_update_interval = 30  # Update path every 30 frames
+        self.paths = None  # PathScheduler to queue path requests with, or None to search here
+        self.awake_until = ALWAYS_AWAKE  # Last tick it moves unless woken again
 
     def _load_animation(self, anim_type, frame_count, speed, loop=True):
         """Load animation frames with error handling"""
         frames = []
+        mirrored = []
         for i in range(frame_count):
             try:
                 frame_path = os.path.join("sprites", "enemy", anim_type, f"{i}.png")
-                frame = pygame.image.load(frame_path).convert_alpha()
-                frames.append(frame)
+                frames.append(assets.image(frame_path))
+                mirrored.append(assets.variant(frame_path, flip_x=True))
             except:
                 # Create colored placeholder with frame number
                 frame = pygame.Surface((self.sprite_width, self.sprite_height), pygame.SRCALPHA)
@@ -56,63 +61,33 @@ class Enemy:
                 text = font.render(f"{anim_type[0]}{i}", True, (255, 255, 255))
                 frame.blit(text, (5, 5))
                 frames.append(frame)
-        return Animation(frames, speed, loop)
+                mirrored.append(pygame.transform.flip(frame, True, False))
+        return Animation(frames, speed, loop, mirrored)
+
+    def tile(self):
+        """Tile under the centre of the hitbox"""
+        return (self.hitbox.centerx // self.tile_size, self.hitbox.centery // self.tile_size)
+
+    def _target_tile(self, player):
+        return (player.hitbox.centerx // self.tile_size, player.hitbox.centery // self.tile_size)
 
     def _find_path(self, player):
-        """A* pathfinding to player"""
-        start = (self.hitbox.centerx // self.tile_size, self.hitbox.centery // self.tile_size)
-        goal = (player.hitbox.centerx // self.tile_size, player.hitbox.centery // self.tile_size)
-        
-        frontier = PriorityQueue()
-        frontier.put((0, start))
-        came_from = {}
-        cost_so_far = {start: 0}
-        
-        while not frontier.empty():
-            current = frontier.get()[1]
-            
-            if current == goal:
-                break
-                
-            for next_pos in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                new_pos = (current[0] + next_pos[0], current[1] + next_pos[1])
-                
-                if (0 <= new_pos[0] < len(self.game_map.tiles[0]) and 
-                    0 <= new_pos[1] < len(self.game_map.tiles) and
-                    not self.game_map.tile_kinds[self.game_map.tiles[new_pos[1]][new_pos[0]]].is_solid):
-                    
-                    new_cost = cost_so_far[current] + 1
-                    
-                    if new_pos not in cost_so_far or new_cost < cost_so_far[new_pos]:
-                        cost_so_far[new_pos] = new_cost
-                        priority = new_cost + self._heuristic(goal, new_pos)
-                        frontier.put((priority, new_pos))
-                        came_from[new_pos] = current
-        
-        # Reconstruct path
-        current = goal
-        path = []
-        while current != start:
-            if current not in came_from:
-                return []  # No path found
-            path.append(current)
-            current = came_from[current]
-        path.reverse()
-        return path
-
-    def _heuristic(self, a, b):
-        """Manhattan distance heuristic"""
-        return abs(a[0] - b[0]) + abs(a[1] - b[1])
+        """Next tiles toward the player from the map's shared pathfinder"""
+        return self.game_map.pathfinder.route(self.tile(), self._target_tile(player))
 
     def update(self, player):
         """Update enemy state with pathfinding"""
-        if self.state == "Death":
-            self.current_anim.update()
-            return self.current_anim.done
-            
-        # Update path periodically
+        # Update path once the current one is used up, or periodically
         self.path_update_timer += 1
-        if self.path_update_timer >= self.path_update_interval:
+        if self.paths is not None:
+            # The scheduler fills self.path in later. Running out of path
+            # early does not reset the timer, so refreshes stay staggered
+            refresh = self.path_update_timer >= self.path_update_interval
+            if refresh:
+                self.path_update_timer = 0
+            if refresh or not self.path:
+                self.paths.request(self, self._target_tile(player))
+        elif not self.path or self.path_update_timer >= self.path_update_interval:
             self.path = self._find_path(player)
             self.path_update_timer = 0
         
@@ -144,52 +119,273 @@ class Enemy:
                 if distance < self.speed:
                     self.path.pop(0)
         
-        # Update animation
+        # Update animation (bullet hits are resolved by the game loop)
         self.current_anim.update()
 
-        # Check bullet collisions
-        for bullet in player.bullets[:]:
-            if self.hitbox.colliderect(bullet.hitbox):
-                player.bullets.remove(bullet)
-                self.health -= 1
-                if self.health <= 0:
-                    self._die()
-                    return True
-        return False
-
-    def _die(self):
-        """Handle death sequence"""
-        self.state = "Death"
-        self.current_anim = self.animations["Death"]
-        self.current_anim.reset()
-        self.speed = 0
-
-    def draw(self, screen):
-        """Draw current animation frame"""
-        frame = self.current_anim.current_frame
-        if self.direction < 0 and self.state != "Death":
-            frame = pygame.transform.flip(frame, True, False)
+    def draw(self, screen, offset=(0, 0)):
+        """Draw current animation frame; returns the area drawn"""
+        frame = self.current_anim.frame(mirrored=self.direction < 0)
         
-        draw_x = self.hitbox.centerx - frame.get_width() // 2
-        draw_y = self.hitbox.centery - frame.get_height() // 2
-        screen.blit(frame, (draw_x, draw_y))
+        draw_x = self.hitbox.centerx - frame.get_width() // 2 - offset[0]
+        draw_y = self.hitbox.centery - frame.get_height() // 2 - offset[1]
+        return screen.blit(frame, (draw_x, draw_y))
 
     def _check_collision(self):
         """Check collision with walls"""
-        start_x = max(0, self.hitbox.left // self.tile_size - 1)
-        end_x = min(len(self.game_map.tiles[0]), (self.hitbox.right // self.tile_size) + 1)
-        start_y = max(0, self.hitbox.top // self.tile_size - 1)
-        end_y = min(len(self.game_map.tiles), (self.hitbox.bottom // self.tile_size) + 1)
-
-        for y in range(start_y, end_y):
-            for x in range(start_x, end_x):
-                if self.game_map.tile_kinds[self.game_map.tiles[y][x]].is_solid:
-                    wall_rect = pygame.Rect(
-                        x * self.tile_size,
-                        y * self.tile_size,
-                        self.tile_size,
-                        self.tile_size
-                    )
-                    if self.hitbox.colliderect(wall_rect):
-                        return True
-        return False
\ No newline at end of file
+        return check_collision_with_walls(self.hitbox, self.game_map)
+
+def _load_frames(anim_type, frame_count):
+    """Frames of an enemy animation and their mirrored copies"""
+    paths = [os.path.join("sprites", "enemy", anim_type, f"{i}.png") for i in range(frame_count)]
+    return [assets.image(path) for path in paths], [assets.variant(path, flip_x=True) for path in paths]
+
+def _round(value):
+    """Round half away from zero, as pygame.Rect does with floats"""
+    return int(value + 0.5) if value >= 0 else int(value - 0.5)
+
+class EnemyPool:
+    """Struct-of-arrays storage for many enemies, all updated in one pass.
+
+    Positions, health, speed, direction, path timers and animation state
+    of live enemies are packed into slots [0, count) of flat arrays, and
+    update() follows every enemy's path in a single loop with no method
+    call per enemy. Each slot has a PooledEnemy view with the attributes of
+    Enemy that the rest of the game uses. Dead enemies are removed with
+    remove_dead(), which keeps the survivors in order.
+    """
+    def __init__(self, tile_size, game_map):
+        self.tile_size = tile_size
+        self.game_map = game_map
+        self.paths = None  # PathScheduler to queue path requests with, or None to search here
+        self.path_update_interval = 30  # Update path every 30 frames
+        self.frames, self.mirrored = _load_frames("Run", 6)
+        self.frame_duration = 8
+        sprite_width, sprite_height = self.frames[0].get_size()
+        # Smaller hitbox (60% of sprite size), the same for every enemy
+        self.hitbox_width = int(sprite_width * 0.6)
+        self.hitbox_height = int(sprite_height * 0.6)
+        self.count = 0
+        self.wall_tests = 0  # Wall queries of the last update(), read by the frame profiler
+        self.xs = array("i")
+        self.ys = array("i")
+        self.speeds = array("i")
+        self.healths = array("i")
+        self.directions = array("b")
+        self.timers = array("i")  # Ticks since the last path update
+        self.awake_until = array("i")  # Last tick each enemy moves unless woken again
+        self.frame_indices = array("i")
+        self.frame_timers = array("i")
+        self.routes = []  # Tiles still to walk, per slot
+        self.views = []
+
+    def _columns(self):
+        return (self.xs, self.ys, self.speeds, self.healths, self.directions,
+                self.timers, self.awake_until, self.frame_indices, self.frame_timers)
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, rng=random):
+        """Add an enemy on the tile whose top-left pixel is (x, y); returns its view"""
+        tile_size = self.tile_size
+        self.xs.append(x + (tile_size - self.hitbox_width) // 2)
+        self.ys.append(y + (tile_size - self.hitbox_height) // 2)
+        self.speeds.append(2)
+        self.healths.append(1)
+        self.directions.append(rng.choice([-1, 1]))  # -1: left, 1: right
+        for column in (self.timers, self.frame_indices, self.frame_timers):
+            column.append(0)
+        self.awake_until.append(ALWAYS_AWAKE)
+        self.routes.append([])
+        view = PooledEnemy(self, self.count)
+        self.views.append(view)
+        self.count += 1
+        return view
+
+    def rect(self, slot):
+        return (self.xs[slot], self.ys[slot], self.hitbox_width, self.hitbox_height)
+
+    def rects(self):
+        """Hitbox of every enemy, by slot"""
+        width, height = self.hitbox_width, self.hitbox_height
+        return [(x, y, width, height) for x, y in zip(self.xs, self.ys)]
+
+    def remove_dead(self):
+        """Drop every enemy whose health ran out; returns their views"""
+        healths = self.healths
+        keep = [slot for slot in range(self.count) if healths[slot] > 0]
+        if len(keep) == self.count:
+            return []
+        dead = [self.views[slot] for slot in range(self.count) if healths[slot] <= 0]
+        for column in self._columns():
+            column[:] = array(column.typecode, [column[slot] for slot in keep])
+        self.routes = [self.routes[slot] for slot in keep]
+        self.views = [self.views[slot] for slot in keep]
+        for slot, view in enumerate(self.views):
+            view.slot = slot
+        for view in dead:
+            view.alive = False
+        self.count = len(keep)
+        return dead
+
+    def update(self, player, tick=0):
+        """Move every enemy awake at tick one step along its path, like
+        Enemy.update; returns the slots of those enemies"""
+        tile_size = self.tile_size
+        half_tile = tile_size // 2
+        half_width = self.hitbox_width // 2
+        half_height = self.hitbox_height // 2
+        goal = (player.hitbox.centerx // tile_size, player.hitbox.centery // tile_size)
+        scheduler = self.paths
+        route = self.game_map.pathfinder.route
+        game_map = self.game_map
+        interval = self.path_update_interval
+        frame_count = len(self.frames)
+        frame_duration = self.frame_duration
+        xs, ys, speeds, directions = self.xs, self.ys, self.speeds, self.directions
+        timers, frame_indices, frame_timers = self.timers, self.frame_indices, self.frame_timers
+        routes, views = self.routes, self.views
+        width, height = self.hitbox_width, self.hitbox_height
+        # A hitbox no bigger than a tile overlaps at most 2x2 tiles, tested
+        # inline while it stays inside the map
+        solid = game_map.solid
+        map_width = game_map.width
+        inline_walls = width <= tile_size and height <= tile_size
+        max_x = map_width * tile_size - width
+        max_y = game_map.height * tile_size - height
+        awake_until = self.awake_until
+        wall_tests = 0
+        awake = []
+
+        for slot in range(self.count):
+            if awake_until[slot] < tick:
+                continue  # Dormant
+            awake.append(slot)
+            x, y = xs[slot], ys[slot]
+            # Update path once the current one is used up, or periodically
+            path = routes[slot]
+            timer = timers[slot] + 1
+            if scheduler is not None:
+                refresh = timer >= interval
+                if refresh:
+                    timer = 0
+                if refresh or not path:
+                    scheduler.request(views[slot], goal)
+            elif not path or timer >= interval:
+                path = routes[slot] = route(((x + half_width) // tile_size, (y + half_height) // tile_size), goal)
+                timer = 0
+            timers[slot] = timer
+
+            # Follow path
+            if path:
+                target_x, target_y = path[0]
+                dx = target_x * tile_size + half_tile - (x + half_width)
+                dy = target_y * tile_size + half_tile - (y + half_height)
+                distance = (dx * dx + dy * dy) ** 0.5
+                if distance > 0:
+                    speed = speeds[slot]
+                    dx = dx / distance * speed
+                    dy = dy / distance * speed
+                    directions[slot] = -1 if dx < 0 else 1
+                    new_x, new_y = _round(x + dx), _round(y + dy)
+                    if inline_walls and 0 <= new_x <= max_x and 0 <= new_y <= max_y:
+                        wall_tests += 1
+                        top = new_y // tile_size * map_width
+                        bottom = (new_y + height - 1) // tile_size * map_width
+                        left = new_x // tile_size
+                        right = (new_x + width - 1) // tile_size
+                        hit = solid[top + left] or solid[top + right] or solid[bottom + left] or solid[bottom + right]
+                    else:
+                        wall_tests += 1
+                        hit = box_hits_wall(new_x, new_y, new_x + width, new_y + height, game_map)
+                    if hit:
+                        routes[slot] = []  # Force path recalculation
+                    else:
+                        xs[slot], ys[slot] = new_x, new_y
+                        # If close to target, remove it from path
+                        if distance < speed:
+                            path.pop(0)
+
+            # Run animation
+            frame_timer = frame_timers[slot] + 1
+            if frame_timer >= frame_duration:
+                frame_timer -= frame_duration
+                frame_indices[slot] = (frame_indices[slot] + 1) % frame_count
+            frame_timers[slot] = frame_timer
+        self.wall_tests = wall_tests
+        return awake
+
+    def draw(self, screen, slot, offset=(0, 0)):
+        """Draw one enemy's current frame; returns the area drawn"""
+        frames = self.mirrored if self.directions[slot] < 0 else self.frames
+        frame = frames[self.frame_indices[slot]]
+        draw_x = self.xs[slot] + self.hitbox_width // 2 - frame.get_width() // 2 - offset[0]
+        draw_y = self.ys[slot] + self.hitbox_height // 2 - frame.get_height() // 2 - offset[1]
+        return screen.blit(frame, (draw_x, draw_y))
+
+class PooledEnemy:
+    """Enemy-like view of one EnemyPool slot.
+
+    hitbox is a fresh Rect on every access; move the enemy through the
+    pool's arrays rather than by changing it. Once remove_dead() drops the
+    enemy, its slot belongs to another one: reading through the view
+    raises ReferenceError and writing to it does nothing, as writing to a
+    dead Enemy would not affect the game.
+    """
+    def __init__(self, pool, slot):
+        self.pool = pool
+        self.slot = slot
+        self.alive = True  # False once removed from the pool
+
+    def _slot(self):
+        if not self.alive:
+            raise ReferenceError("enemy was removed from its pool")
+        return self.slot
+
+    @property
+    def hitbox(self):
+        return pygame.Rect(self.pool.rect(self._slot()))
+
+    @property
+    def health(self):
+        return self.pool.healths[self._slot()]
+
+    @health.setter
+    def health(self, health):
+        if self.alive:
+            self.pool.healths[self.slot] = health
+
+    @property
+    def path(self):
+        return self.pool.routes[self._slot()]
+
+    @path.setter
+    def path(self, path):
+        if self.alive:
+            self.pool.routes[self.slot] = path
+
+    @property
+    def direction(self):
+        return self.pool.directions[self._slot()]
+
+    @property
+    def speed(self):
+        return self.pool.speeds[self._slot()]
+
+    @property
+    def awake_until(self):
+        return self.pool.awake_until[self._slot()]
+
+    @awake_until.setter
+    def awake_until(self, tick):
+        if self.alive:
+            self.pool.awake_until[self.slot] = tick
+
+    def tile(self):
+        """Tile under the centre of the hitbox"""
+        x, y, width, height = self.pool.rect(self._slot())
+        tile_size = self.pool.tile_size
+        return ((x + width // 2) // tile_size, (y + height // 2) // tile_size)
+
+    def draw(self, screen, offset=(0, 0)):
+        return self.pool.draw(screen, self._slot(), offset)
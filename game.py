@@ -2,18 +2,21 @@ import pygame
 import sys
 import os
 from button import Button
-from map import Map, TileKind
-from soldier import Player
-from enemies import Enemy
-from collision import check_collision_with_enemies
-from diamonds import Diamond, generate_diamonds
+from session import GameSession
+from replay import Recording
+from profiler import FrameProfiler
+from render import DirtyRenderer
+from camera import Camera
 
 # États du jeu
 MENU = 0
 PLAYING = 1
 GAME_OVER = 2
 
-def show_menu(screen):
+LOADING_POLL_MS = 50  # Progress bar refresh interval while a level loads
+
+def show_menu(screen, loader=None):
+    """Menu principal; shows the progress of the level loader, if any"""
     screen_width, screen_height = screen.get_size()
     
     # Création des boutons
@@ -34,28 +37,35 @@ def show_menu(screen):
     pygame.mixer.music.set_volume(0.3)
     pygame.mixer.music.play(-1)  # Boucle infinie
 
+    title_font = pygame.font.Font(None, 48)
+    title = title_font.render("Castle GAME", True, (200, 200, 255))
+    redraw = True
+    shown_progress = None
+
     while True:
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_clicked = False
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                mouse_clicked = True
+        loading = loader is not None and loader.pending and not loader.ready
+        progress = loader.progress if loading else None
+        # Redessine seulement quand quelque chose a changé
+        if redraw or progress != shown_progress:
+            # Fond d'écran simple
+            screen.fill((0, 0, 30))
+            
+            # Titre
+            screen.blit(title, (screen_width//2 - title.get_width()//2, 50))
 
-        # Fond d'écran simple
-        screen.fill((0, 0, 30))
-        
-        # Titre
-        title_font = pygame.font.Font(None, 48)
-        title = title_font.render("Castle GAME", True, (200, 200, 255))
-        screen.blit(title, (screen_width//2 - title.get_width()//2, 50))
+            # Boutons
+            start_button.draw(screen)
+            exit_button.draw(screen)
+            if loading:
+                _draw_progress(screen, progress)
 
-        # Boutons
-        start_button.draw(screen)
-        exit_button.draw(screen)
+            pygame.display.flip()
+            shown_progress = progress
+
+        # While a level loads, wake up regularly to follow its progress
+        mouse_clicked, redraw = _wait_for_input(LOADING_POLL_MS if loading else 0)
+        mouse_pos = pygame.mouse.get_pos()
+        hovered = (start_button.is_hovered, exit_button.is_hovered)
 
         # Gestion des clics
         if start_button.check_click(mouse_pos, mouse_clicked):
@@ -63,8 +73,7 @@ def show_menu(screen):
         if exit_button.check_click(mouse_pos, mouse_clicked):
             pygame.quit()
             sys.exit()
-
-        pygame.display.flip()
+        redraw = redraw or hovered != (start_button.is_hovered, exit_button.is_hovered)
 
 def show_game_over(screen, won):
     screen_width, screen_height = screen.get_size()
@@ -82,158 +91,177 @@ def show_game_over(screen, won):
         "MENU", (100, 0, 100), (150, 0, 150)
     )
 
+    # Message
+    font = pygame.font.Font(None, 36)
+    text = "YOU WIN!" if won else "GAME OVER"
+    color = (0, 255, 0) if won else (255, 0, 0)
+    text_surf = font.render(text, True, color)
+    redraw = True
+
     while True:
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_clicked = False
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                mouse_clicked = True
+        if redraw:
+            # Fond simple
+            screen.fill((0, 0, 30))
+            screen.blit(text_surf, (screen_width//2 - text_surf.get_width()//2, screen_height//2 - 50))
 
-        # Fond simple
-        screen.fill((0, 0, 30))
+            # Boutons
+            restart_button.draw(screen)
+            menu_button.draw(screen)
 
-        # Message
-        font = pygame.font.Font(None, 36)
-        text = "YOU WIN!" if won else "GAME OVER"
-        color = (0, 255, 0) if won else (255, 0, 0)
-        text_surf = font.render(text, True, color)
-        screen.blit(text_surf, (screen_width//2 - text_surf.get_width()//2, screen_height//2 - 50))
+            pygame.display.flip()
 
-        # Boutons
-        restart_button.draw(screen)
-        menu_button.draw(screen)
+        mouse_clicked, redraw = _wait_for_input()
+        mouse_pos = pygame.mouse.get_pos()
+        hovered = (restart_button.is_hovered, menu_button.is_hovered)
 
         # Gestion des clics
         if restart_button.check_click(mouse_pos, mouse_clicked):
             return PLAYING
         if menu_button.check_click(mouse_pos, mouse_clicked):
             return MENU
+        redraw = redraw or hovered != (restart_button.is_hovered, menu_button.is_hovered)
+
+def _wait_for_input(timeout=0):
+    """Block until at least one event arrives instead of spinning, or until
+    timeout milliseconds pass (0 waits forever).
+
+    Returns (left click happened, window needs repainting).
+    """
+    mouse_clicked = False
+    exposed = False
+    for event in [pygame.event.wait(timeout)] + pygame.event.get():
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            mouse_clicked = True
+        if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            exposed = True
+    return mouse_clicked, exposed
 
+def _draw_progress(screen, fraction):
+    """Barre de progression du chargement en bas de l'écran"""
+    screen_width, screen_height = screen.get_size()
+    outline = pygame.Rect(screen_width//2 - 100, screen_height - 60, 200, 12)
+    pygame.draw.rect(screen, (60, 60, 90), outline)
+    pygame.draw.rect(screen, (200, 200, 255), (outline.x, outline.y, int(outline.width * fraction), outline.height))
+    pygame.draw.rect(screen, (255, 255, 255), outline, 1)
+
+def _show_loading(screen, loader):
+    """Écran de chargement, jusqu'à ce que le niveau soit prêt"""
+    font = pygame.font.Font(None, 36)
+    text = font.render("Loading...", True, (200, 200, 255))
+    while not loader.ready:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        screen.fill((0, 0, 30))
+        screen.blit(text, (screen.get_width()//2 - text.get_width()//2, screen.get_height()//2 - 20))
+        _draw_progress(screen, loader.progress)
         pygame.display.flip()
+        pygame.time.wait(LOADING_POLL_MS)
 
-def run_game(screen):
-    # Configuration des tuiles
-    tile_size = 32
-    tile_kinds = [
-        TileKind("floor", (200, 200, 200), False),
-        TileKind("wall", (50, 50, 50), True),
-        TileKind("start", (0, 255, 0), False),
-        TileKind("end", (255, 0, 0), False)
-    ]
-    
-    # Chargement des effets sonores
-    shoot_sound = pygame.mixer.Sound(os.path.join("sounds", "shoot.wav"))
-    death_sound = pygame.mixer.Sound(os.path.join("sounds", "death.wav"))
-    diamond_sound = pygame.mixer.Sound(os.path.join("sounds", "diamond.wav"))
-    shoot_sound.set_volume(0.5)
-    death_sound.set_volume(0.5)
-    diamond_sound.set_volume(0.5)
-    
+def run_game(screen, fps=60, seed=None, record_path=None, profile_path=None, dirty=False,
+             loader=None, path_workers=0):
+    """Play one level; fps=0 removes the frame cap.
+
+    With record_path, the seed and every tick's keys are saved there on exit
+    so the game can be replayed with replay.py. With profile_path, per-frame
+    phase timings are written there (CSV, or JSON for .json). F3 toggles the
+    profiling overlay. dirty=True only repaints and pushes changed areas.
+    With a LevelLoader, the level it prepared is played and the next one
+    is prefetched in the background during play. path_workers > 0 searches
+    enemy paths in that many processes.
+    """
     # Chargement de la carte 
     try:
-        map_path = os.path.join(os.path.dirname(__file__), "start.map")
-        game_map = Map(map_path, tile_kinds, tile_size)
+        if loader is not None and loader.pending:
+            if not loader.ready:
+                _show_loading(screen, loader)
+            session = GameSession(level=loader.take(), path_workers=path_workers)
+        else:
+            session = GameSession(seed=seed, path_workers=path_workers)
     except FileNotFoundError:
         print("ERREUR: Fichier start.map introuvable!")
         return MENU, False
+    if loader is not None:
+        loader.start(seed=seed)
 
-    # Initialisation des entités
-    player = Player(game_map.start_pos[0], game_map.start_pos[1], tile_size)
-    enemies = [
-        Enemy(5 * tile_size, 3 * tile_size, tile_size, game_map),
-        Enemy(8 * tile_size, 7 * tile_size, tile_size, game_map),
-        Enemy(13 * tile_size, 13 * tile_size, tile_size, game_map),
-        Enemy(13 * tile_size, 15 * tile_size, tile_size, game_map),
-        Enemy(13 * tile_size, 17 * tile_size, tile_size, game_map),
-        Enemy(16 * tile_size, 1 * tile_size, tile_size, game_map)
-    ]
-    diamonds = generate_diamonds(game_map, tile_size, density=0.15)
-    score = 0
-    game_won = False
-    font = pygame.font.Font(None, 36)
+    recording = Recording(session.seed) if record_path else None
+    profiler = FrameProfiler(trace=True) if profile_path else None
+    show_overlay = False
+    session.attach_profiler(profiler)
 
+    def finish(state, won):
+        session.close()
+        if recording:
+            recording.final_hash = session.state_hash()
+            recording.save(record_path)
+        if profile_path:
+            profiler.dump(profile_path)
+        return state, won
+
+    font = pygame.font.Font(None, 36)
+    overlay_font = pygame.font.Font(None, 20)
     clock = pygame.time.Clock()
+    renderer = DirtyRenderer(screen) if dirty else None
+    game_map = session.game_map
+    camera = Camera(*screen.get_size(), game_map.width * game_map.tile_size,
+                    game_map.height * game_map.tile_size)
+
+    def draw_hud(target):
+        """Interface utilisateur; returns the areas drawn"""
+        score_text = font.render(f"Score: {session.score}", True, (255, 255, 255))
+        areas = [target.blit(score_text, (10, 10))]
+        if profiler and show_overlay:
+            areas.append(profiler.draw_overlay(target, overlay_font))
+        return areas
     
     while True:
+        if profiler:
+            profiler.begin_frame()
+
         # Gestion des événements
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                return MENU, False
+                return finish(MENU, False)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                show_overlay = not show_overlay
+                if show_overlay and not profiler:
+                    profiler = FrameProfiler()
+                    profiler.begin_frame()
+                    session.attach_profiler(profiler)
+                elif not show_overlay and not profile_path:
+                    profiler = None
+                    session.attach_profiler(None)
+        if profiler:
+            profiler.mark("events")
         
         # Mise à jour du jeu
         keys = pygame.key.get_pressed()
-        player.handle_movement(keys, game_map)
-        
-        # Gestion des balles
-        for bullet in player.bullets[:]:
-            if not bullet.update(game_map):
-               player.bullets.remove(bullet)
-            else:
-                for enemy in enemies[:]:
-                   if bullet.hitbox.colliderect(enemy.hitbox):
-                      player.bullets.remove(bullet)
-                      enemy.health -= 1
-                      if enemy.health <= 0:
-                         enemies.remove(enemy)
-                         score += 20
-                      break
-        
-        # Mise à jour des ennemis
-        for enemy in enemies[:]:
-            should_remove = enemy.update(player)
-            if should_remove:
-               enemies.remove(enemy)
-               score += 20
-        
-        # Collisions joueur-ennemi
-        if check_collision_with_enemies(player.hitbox, enemies):
-            player.take_damage(1)
-            if player.health <= 0:
-                death_sound.play()
-                return GAME_OVER, False
-        
-        # Collecte des diamants
-        for diamond in diamonds[:]:
-            if not diamond.collected and player.hitbox.colliderect(diamond.rect):
-                diamond.collected = True
-                score += 10
-                diamonds.remove(diamond)
-                diamond_sound.play()
-        
-        # Condition de victoire
-        tile_x = player.hitbox.centerx // tile_size
-        tile_y = player.hitbox.centery // tile_size
-        if (0 <= tile_y < len(game_map.tiles) and 
-            0 <= tile_x < len(game_map.tiles[0])):
-            if game_map.tiles[tile_y][tile_x] == 3:
-                return GAME_OVER, True
-
-        # Rendu
-        screen.fill((0, 0, 0))
-        game_map.draw(screen)
-        
-        # Dessiner les objets dans l'ordre
-        for diamond in diamonds:
-            diamond.draw(screen)
-            
-        for bullet in player.bullets:
-            bullet.draw(screen)
-            
-        for enemy in enemies:
-            enemy.draw(screen)
-            
-        player.draw(screen)
-        
-        # Interface utilisateur
-        score_text = font.render(f"Score: {score}", True, (255, 255, 255))
-        screen.blit(score_text, (10, 10))
-        
-        pygame.display.flip()
-        clock.tick(60)
\ No newline at end of file
+        if recording:
+            keys = recording.record(keys)
+        result = session.step(keys)
+        if result is not None:
+            return finish(GAME_OVER, result)
+
+        # Rendu: la caméra suit le joueur
+        camera.follow(session.player.hitbox)
+        session.view = camera.rect
+        if renderer:
+            renderer.render(session, draw_hud, camera, profiler)
+        else:
+            screen.fill((0, 0, 0))
+            session.draw(screen, camera)
+            draw_hud(screen)
+            if profiler:
+                profiler.mark("render")
+            pygame.display.flip()
+        if profiler:
+            profiler.mark("flip")
+            profiler.end_frame()
+        clock.tick(fps)
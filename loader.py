@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+from assets import assets
+from session import prepare_level
+
+class LevelLoader:
+    """Prepares the next level on a worker thread while the game runs.
+
+    start() decodes the sprites, then builds a Level with prepare_level();
+    progress follows the worker so the menu can show a progress bar, and
+    take() hands the Level over once it is ready. Each Level is used by a
+    single session, so callers start the next one as soon as they take one.
+    """
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-loader")
+        self._future = None
+        self.progress = 0.0  # Fraction of the current level prepared
+
+    def start(self, **options):
+        """Prepare a level in the background; options go to prepare_level()"""
+        self.progress = 0.0
+        self._future = self._executor.submit(self._prepare, options)
+
+    def _prepare(self, options):
+        # Sessions then load their sprites without decoding any PNG
+        assets.decode("sprites")
+        self._report(0.25, "sprites")
+        return prepare_level(progress=lambda fraction, stage: self._report(0.25 + 0.75 * fraction, stage),
+                             **options)
+
+    def _report(self, fraction, stage):
+        self.progress = fraction
+
+    @property
+    def pending(self):
+        """True once start() was called and the level was not taken yet"""
+        return self._future is not None
+
+    @property
+    def ready(self):
+        return self._future is not None and self._future.done()
+
+    def take(self):
+        """The prepared Level, waiting for it if needed.
+
+        Errors raised while preparing it (a missing map file) are raised here.
+        """
+        future, self._future = self._future, None
+        return future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,26 +1,67 @@
+import argparse
+import os
 import pygame
 from game import show_menu, show_game_over, run_game
+from assets import assets
+from loader import LevelLoader
 
 # États du jeu
 MENU = 0
 PLAYING = 1
 GAME_OVER = 2
 
+def seed_argument(text):
+    """--seed value: recordings store seeds as unsigned 64-bit integers"""
+    seed = int(text)
+    if not 0 <= seed < 2 ** 64:
+        raise argparse.ArgumentTypeError(f"seed must be between 0 and 2**64 - 1, not {seed}")
+    return seed
+
+def numbered(path, number):
+    """path with -number before its extension: game.rec -> game-2.rec"""
+    if path is None:
+        return None
+    root, extension = os.path.splitext(path)
+    return f"{root}-{number}{extension}"
+
 def main():
+    parser = argparse.ArgumentParser(description="Castle Game")
+    parser.add_argument("--seed", type=seed_argument, help="seed for enemies and diamonds")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record each game's inputs for replay.py, game N to PATH-N")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="write per-frame timings of each game, game N to PATH-N (CSV, or JSON for .json)")
+    parser.add_argument("--dirty", action="store_true",
+                        help="repaint only the parts of the screen that changed")
+    parser.add_argument("--path-workers", type=int, default=0, metavar="N",
+                        help="search enemy paths in N processes (games can't be replayed)")
+    args = parser.parse_args()
+
     pygame.init()
     screen_width = 640
     screen_height = 640
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Castle Game")
+
+    # Decode the sprites and prepare the first level in the background
+    # while the menu is shown
+    assets.preload("sprites")
+    loader = LevelLoader()
+    loader.start(seed=args.seed)
     
     game_state = MENU
     game_result = False
+    games = 0
     
     while True:
         if game_state == MENU:
-            game_state = show_menu(screen)
+            game_state = show_menu(screen, loader)
         elif game_state == PLAYING:
-            game_state, game_result = run_game(screen)
+            games += 1
+            game_state, game_result = run_game(
+                screen, seed=args.seed, record_path=numbered(args.record, games),
+                profile_path=numbered(args.profile, games),
+                dirty=args.dirty, loader=loader, path_workers=args.path_workers)
         elif game_state == GAME_OVER:
             game_state = show_game_over(screen, game_result)
 
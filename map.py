@@ -1,4 +1,11 @@
 import pygame
+from collections import OrderedDict
+from pathfinding import FlowField, HierarchicalPathfinder
+from visibility import Visibility
+from mapfile import CHUNKED_EXTENSION, ChunkCache, ChunkedMapFile, LazyGrid, read_text_map
+
+CHUNK_SIZE = 16  # Tiles per side of a cached map chunk
+RENDER_CACHE_CHUNKS = 64  # Rendered chunk surfaces kept per layer, least recently drawn dropped first
 
 class TileKind:
     def __init__(self, name, color, is_solid):
@@ -6,41 +13,154 @@ class TileKind:
         self.color = color
         self.is_solid = is_solid
 
+STREAM_RADIUS = 2  # Chunks kept loaded around the player on streamed maps
+STREAM_PATH_RANGE = 64  # Flow-field radius in tiles on streamed maps
+HIERARCHICAL_MIN_TILES = 128 * 128  # In-memory maps this large use HPA* instead of a flow field
+
 class Map:
-    def __init__(self, map_file, tile_kinds, tile_size):
+    """Tile map stored as a flat bytearray, one byte per tile.
+
+    `grid[y * width + x]` is the tile index and `solid[y * width + x]` is 1
+    for solid tiles, so collision code can test solidity with one lookup.
+    Chunked .fgm maps are streamed instead: grid and solid are LazyGrids
+    that decompress chunks on first access, and focus() keeps only the
+    chunks around the player in memory.
+    """
+    def __init__(self, map_file, tile_kinds, tile_size, verbose=False):
         self.tile_kinds = tile_kinds
         self.tile_size = tile_size
-        self.tiles = []
+        self._chunks = OrderedDict()  # (chunk_x, chunk_y) -> pre-rendered surface, LRU
         self.start_pos = (1 * tile_size, 1 * tile_size)  # Default start
         self.end_pos = (18 * tile_size, 18 * tile_size)  # Default end
-        
-        with open(map_file, "r") as file:
-            for y, line in enumerate(file):
-                line = line.strip()
-                if line:
-                    row = [int(c) for c in line if c in '0123']  # Now includes 2 and 3
-                    if row:
-                        self.tiles.append(row)
-        
+        solid_table = bytes(kind.is_solid for kind in tile_kinds).ljust(256, b"\0")
+
+        if map_file.endswith(CHUNKED_EXTENSION):
+            source = ChunkedMapFile(map_file)
+            self.width = source.width
+            self.height = source.height
+            self.stream = ChunkCache(source, solid_table)
+            self.grid = LazyGrid(self.stream, 0)
+            self.solid = LazyGrid(self.stream, 1)
+            self.tiles = None  # Rows are never materialised for streamed maps
+            start, end = source.start, source.end
+        else:
+            self.width, self.height, self.grid = read_text_map(map_file)
+            self.stream = None
+            self.solid = bytearray(self.grid.translate(solid_table))
+            # Row views kept for code that still indexes tiles[y][x]
+            grid_view = memoryview(self.grid)
+            self.tiles = [
+                grid_view[y * self.width:(y + 1) * self.width]
+                for y in range(self.height)
+            ]
+            start = self._find_tile(2)
+            end = self._find_tile(3)
+
         # Now find start and end positions
-        for y, row in enumerate(self.tiles):
-            for x, tile in enumerate(row):
-                if tile == 2:  # Start position
-                    self.start_pos = (x * tile_size, y * tile_size)
-                elif tile == 3:  # End position
-                    self.end_pos = (x * tile_size, y * tile_size)
-        
-        print("Map loaded:")
-        for row in self.tiles:
-            print(row)
-        print(f"Start position: {self.start_pos}")
-        print(f"End position: {self.end_pos}")
-
-    def draw(self, screen):
-        for y, row in enumerate(self.tiles):
-            for x, tile in enumerate(row):
-                if tile < len(self.tile_kinds):  # Vérifie que l'index est valide
-                    tile_kind = self.tile_kinds[tile]
-                    rect = pygame.Rect(x * self.tile_size, y * self.tile_size, 
-                                     self.tile_size, self.tile_size)
-                    pygame.draw.rect(screen, tile_kind.color, rect)
\ No newline at end of file
+        if start:
+            self.start_pos = (start[0] * tile_size, start[1] * tile_size)
+        if end:
+            self.end_pos = (end[0] * tile_size, end[1] * tile_size)
+
+        if verbose:
+            print("Map loaded:")
+            for row in self.tiles or ():
+                print(list(row))
+            print(f"Start position: {self.start_pos}")
+            print(f"End position: {self.end_pos}")
+
+        # Shared pathfinding toward the player, used by every enemy. A flow
+        # field answers every query in O(1) but is rebuilt over the whole
+        # map whenever the player changes tile, which large maps can't afford
+        if self.stream is not None:
+            self.pathfinder = FlowField(self, STREAM_PATH_RANGE)
+        elif self.width * self.height >= HIERARCHICAL_MIN_TILES:
+            self.pathfinder = HierarchicalPathfinder(self)
+        else:
+            self.pathfinder = FlowField(self)
+        self.visibility = Visibility(self)  # Views are computed on first use
+
+    def _find_tile(self, tile):
+        index = self.grid.rfind(tile)
+        return (index % self.width, index // self.width) if index >= 0 else None
+
+    def focus(self, tile_x, tile_y):
+        """Keep the chunks around a tile loaded; no-op for in-memory maps"""
+        if self.stream is not None:
+            self.stream.keep_around(tile_x, tile_y, STREAM_RADIUS)
+
+    def tile_at(self, x, y):
+        """Tile index at (x, y); callers check bounds"""
+        return self.grid[y * self.width + x]
+
+    def is_solid(self, x, y):
+        """Solidity of the tile at (x, y); out-of-bounds tiles are not solid"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.solid[y * self.width + x] == 1
+        return False
+
+    def close(self):
+        """Release the file of a streamed map; in-memory maps hold none"""
+        if self.stream is not None:
+            self.stream.source.close()
+
+    def _render_chunk(self, chunk_x, chunk_y):
+        """Render the tiles of one chunk into a cached surface"""
+        first_x = chunk_x * CHUNK_SIZE
+        first_y = chunk_y * CHUNK_SIZE
+        columns = min(CHUNK_SIZE, self.width - first_x)
+        rows = min(CHUNK_SIZE, self.height - first_y)
+        surface = pygame.Surface((columns * self.tile_size, rows * self.tile_size))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill((0, 0, 0))
+        for y in range(first_y, first_y + rows):
+            for x in range(first_x, first_x + columns):
+                self._paint_tile(surface, x, y, first_x, first_y)
+        self._chunks[(chunk_x, chunk_y)] = surface
+        if len(self._chunks) > RENDER_CACHE_CHUNKS:
+            self._chunks.popitem(last=False)
+        return surface
+
+    def _paint_tile(self, surface, x, y, origin_x, origin_y):
+        tile = self.grid[y * self.width + x]
+        rect = ((x - origin_x) * self.tile_size, (y - origin_y) * self.tile_size,
+                self.tile_size, self.tile_size)
+        if tile < len(self.tile_kinds):  # Vérifie que l'index est valide
+            surface.fill(self.tile_kinds[tile].color, rect)
+        else:
+            surface.fill((0, 0, 0), rect)
+
+    def set_tile(self, x, y, tile):
+        """Change one tile and patch only that tile in the cached layer"""
+        index = y * self.width + x
+        self.grid[index] = tile
+        self.solid[index] = self.tile_kinds[tile].is_solid
+        self.pathfinder.invalidate(x, y)
+        self.visibility.clear()
+        chunk_x, chunk_y = x // CHUNK_SIZE, y // CHUNK_SIZE
+        surface = self._chunks.get((chunk_x, chunk_y))
+        if surface is not None:
+            self._paint_tile(surface, x, y, chunk_x * CHUNK_SIZE, chunk_y * CHUNK_SIZE)
+
+    def draw(self, screen, offset=(0, 0)):
+        """Blit the cached chunks that intersect the screen's clip area.
+
+        offset is the world position drawn at the screen's top-left corner;
+        chunks outside the view are neither rendered nor blitted.
+        """
+        offset_x, offset_y = offset
+        clip = screen.get_clip().move(offset_x, offset_y)
+        chunk_pixels = CHUNK_SIZE * self.tile_size
+        chunks_x = (self.width + CHUNK_SIZE - 1) // CHUNK_SIZE
+        chunks_y = (self.height + CHUNK_SIZE - 1) // CHUNK_SIZE
+        for chunk_y in range(max(0, clip.top // chunk_pixels),
+                             min(chunks_y, (clip.bottom - 1) // chunk_pixels + 1)):
+            for chunk_x in range(max(0, clip.left // chunk_pixels),
+                                 min(chunks_x, (clip.right - 1) // chunk_pixels + 1)):
+                surface = self._chunks.get((chunk_x, chunk_y))
+                if surface is None:
+                    surface = self._render_chunk(chunk_x, chunk_y)
+                else:
+                    self._chunks.move_to_end((chunk_x, chunk_y))
+                screen.blit(surface, (chunk_x * chunk_pixels - offset_x, chunk_y * chunk_pixels - offset_y))
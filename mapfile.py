@@ -0,0 +1,180 @@
+"""Map file formats.
+
+Text maps (start.map) hold one digit per tile. Chunked maps (.fgm) split
+the grid into square chunks compressed independently with zlib, behind a
+fixed header and a chunk index, so a level of any size opens instantly
+and only the chunks around the player are ever decompressed:
+
+    python mapfile.py start.map start.fgm [chunk_size]
+"""
+import mmap
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+
+# Map file digits -> tile indices; every other character is dropped
+TILE_DIGITS = bytes.maketrans(b"0123", bytes([0, 1, 2, 3]))
+NON_TILE_BYTES = bytes(c for c in range(256) if c not in b"0123")
+
+CHUNKED_EXTENSION = ".fgm"
+MAGIC = b"FGMC"
+VERSION = 1
+# Magic, version, width, height, chunk size, start x/y and end x/y in tiles (-1 if absent)
+HEADER = struct.Struct("<4sBIIHiiii")
+INDEX_ENTRY = struct.Struct("<QI")  # Offset and compressed length of one chunk
+
+def read_text_map(path):
+    """Parse a digit map into (width, height, grid bytearray)"""
+    rows = []
+    with open(path, "rb") as file:
+        for line in file:
+            row = line.translate(TILE_DIGITS, NON_TILE_BYTES)
+            if row:
+                rows.append(row)
+    width = len(rows[0])
+    height = len(rows)
+    grid = bytearray(width * height)
+    for y, row in enumerate(rows):
+        row = row[:width]
+        grid[y * width:y * width + len(row)] = row
+    return width, height, grid
+
+def _tile_position(grid, width, tile):
+    index = grid.rfind(tile)
+    return (index % width, index // width) if index >= 0 else (-1, -1)
+
+def convert(text_path, out_path, chunk_size=64):
+    """Write a text map as a chunked, compressed map"""
+    width, height, grid = read_text_map(text_path)
+    chunks_x = (width + chunk_size - 1) // chunk_size
+    chunks_y = (height + chunk_size - 1) // chunk_size
+    blobs = []
+    for chunk_y in range(chunks_y):
+        for chunk_x in range(chunks_x):
+            chunk = bytearray(chunk_size * chunk_size)
+            first_x = chunk_x * chunk_size
+            columns = min(chunk_size, width - first_x)
+            for row in range(min(chunk_size, height - chunk_y * chunk_size)):
+                start = (chunk_y * chunk_size + row) * width + first_x
+                chunk[row * chunk_size:row * chunk_size + columns] = grid[start:start + columns]
+            blobs.append(zlib.compress(bytes(chunk)))
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(blobs)
+    with open(out_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, width, height, chunk_size,
+                               *_tile_position(grid, width, 2), *_tile_position(grid, width, 3)))
+        for blob in blobs:
+            file.write(INDEX_ENTRY.pack(offset, len(blob)))
+            offset += len(blob)
+        for blob in blobs:
+            file.write(blob)
+
+class ChunkedMapFile:
+    """Read-only, memory-mapped view of a chunked map"""
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.width, self.height, self.chunk_size,
+         start_x, start_y, end_x, end_y) = HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} chunked map")
+        self.start = (start_x, start_y) if start_x >= 0 else None
+        self.end = (end_x, end_y) if end_x >= 0 else None
+        self.chunks_x = (self.width + self.chunk_size - 1) // self.chunk_size
+        self.chunks_y = (self.height + self.chunk_size - 1) // self.chunk_size
+
+    def read_chunk(self, chunk_x, chunk_y):
+        """Decompressed tiles of one chunk, chunk_size rows of chunk_size"""
+        entry = HEADER.size + INDEX_ENTRY.size * (chunk_y * self.chunks_x + chunk_x)
+        offset, length = INDEX_ENTRY.unpack_from(self._data, entry)
+        return zlib.decompress(self._data[offset:offset + length])
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+class ChunkCache:
+    """Decompressed chunks of a ChunkedMapFile, loaded on first access.
+
+    Each chunk holds its tiles and their solidity mask. At most max_chunks
+    are kept; the least recently used are evicted, except chunks that were
+    modified, which stay pinned.
+    """
+    def __init__(self, source, solid_table, max_chunks=256):
+        self.source = source
+        self.solid_table = solid_table
+        self.max_chunks = max_chunks
+        self.loaded = OrderedDict()  # (chunk_x, chunk_y) -> (tiles, solid)
+        self.pinned = set()
+        self.focus_chunk = None
+
+    def get(self, key):
+        chunk = self.loaded.get(key)
+        if chunk is not None:
+            self.loaded.move_to_end(key)
+            return chunk
+        tiles = bytearray(self.source.read_chunk(*key))
+        chunk = (tiles, bytearray(tiles.translate(self.solid_table)))
+        self.loaded[key] = chunk
+        if len(self.loaded) > self.max_chunks:
+            for old in list(self.loaded):
+                if len(self.loaded) <= self.max_chunks:
+                    break
+                if old not in self.pinned and old != key:
+                    del self.loaded[old]
+        return chunk
+
+    def keep_around(self, tile_x, tile_y, radius):
+        """Load the chunks within radius chunks of a tile and evict the
+        unpinned ones farther away"""
+        size = self.source.chunk_size
+        center = (tile_x // size, tile_y // size)
+        if center == self.focus_chunk:
+            return
+        self.focus_chunk = center
+        for key in list(self.loaded):
+            if (key not in self.pinned and
+                    max(abs(key[0] - center[0]), abs(key[1] - center[1])) > radius):
+                del self.loaded[key]
+        for chunk_y in range(max(0, center[1] - radius), min(self.source.chunks_y, center[1] + radius + 1)):
+            for chunk_x in range(max(0, center[0] - radius), min(self.source.chunks_x, center[0] + radius + 1)):
+                self.get((chunk_x, chunk_y))
+
+class LazyGrid:
+    """Flat tile sequence, indexed like Map.grid, over a ChunkCache.
+
+    layer 0 gives tile indices and layer 1 the solidity mask.
+    """
+    def __init__(self, cache, layer):
+        self.cache = cache
+        self.layer = layer
+        self.width = cache.source.width
+        self.chunk_size = cache.source.chunk_size
+        self._length = cache.source.width * cache.source.height
+
+    def __len__(self):
+        return self._length
+
+    def _locate(self, index):
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        y, x = divmod(index, self.width)
+        size = self.chunk_size
+        return (x // size, y // size), (y % size) * size + x % size
+
+    def __getitem__(self, index):
+        key, local = self._locate(index)
+        return self.cache.get(key)[self.layer][local]
+
+    def __setitem__(self, index, value):
+        key, local = self._locate(index)
+        self.cache.get(key)[self.layer][local] = value
+        self.cache.pinned.add(key)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+if __name__ == "__main__":
+    convert(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 64)
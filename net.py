@@ -0,0 +1,479 @@
+import asyncio
+import logging
+import random
+import struct
+import sys
+import time
+import zlib
+import pygame
+from session import MultiplayerSession, KeyState, DEFAULT_MAP, TICK_RATE, default_tile_kinds, init_headless
+from map import Map
+from diamonds import DiamondField
+from replay import RECORDED_KEYS, encode_keys, decode_keys
+from profiler import FrameProfiler
+from spatial import SpatialHash
+
+# Every message is a length-prefixed frame whose body starts with its type
+FRAME = struct.Struct("<I")
+WELCOME = 1
+INPUT = 2
+SNAPSHOT = 3
+# Type, player id, tile size, interest radius in tiles; then the zlib-packed diamond bitmap
+WELCOME_HEADER = struct.Struct("<BHHH")
+INPUT_BODY = struct.Struct("<BIB")  # Type, input sequence number, key mask
+# Type, tick, last input sequence applied, score, result (0 playing, 1 won, 2 lost)
+SNAPSHOT_HEADER = struct.Struct("<BIIiB")
+COUNT = struct.Struct("<H")
+UNCHANGED = 0xFFFF  # Bullet count meaning "the same bullets as the last snapshot"
+PLAYER_ID = struct.Struct("<H")
+ENEMY_ID = struct.Struct("<I")
+TILE_INDEX = struct.Struct("<I")
+OFFSET = struct.Struct("<hh")  # Bullet position relative to the receiving player
+
+# Entity update: id, a mask of the fields that follow, then those fields in
+# this order. Entities the client does not know yet get every field
+MASK = struct.Struct("<B")
+MOVED = 1  # Position change small enough for one byte per axis
+POSITION = 2
+HEALTH = 4
+FLAGS = 8
+STEP = struct.Struct("<bb")
+POINT = struct.Struct("<ii")
+SMALL = struct.Struct("<b")
+BITS = struct.Struct("<B")
+FACING_LEFT = 1
+RUNNING = 2
+
+INTEREST_RADIUS = 12  # Tiles around a player within which entities are sent
+MAX_FRAME = 1 << 24  # Largest frame a client accepts from the server
+SEND_BUFFER_LIMIT = 1 << 16  # Snapshots are skipped while a client has this much unsent
+
+logger = logging.getLogger(__name__)
+
+def _frame(body):
+    return FRAME.pack(len(body)) + body
+
+async def _read_frame(reader, limit):
+    """Body of the next frame; ValueError if it declares more than limit bytes"""
+    header = await reader.readexactly(FRAME.size)
+    (length,) = FRAME.unpack(header)
+    if length > limit:
+        raise ValueError(f"frame of {length} bytes, at most {limit} expected")
+    return await reader.readexactly(length)
+
+def _player_state(player):
+    flags = (0 if player.facing_right else FACING_LEFT) | (RUNNING if player.state == "Run" else 0)
+    return (player.hitbox.x, player.hitbox.y, player.health, flags)
+
+def _enemy_state(enemy):
+    hitbox = enemy.hitbox
+    return (hitbox.x, hitbox.y, enemy.health, FACING_LEFT if enemy.direction < 0 else 0)
+
+def _encode_entities(states, known, id_format, parts, cache):
+    """Append the updates that turn known into states, then the ids that
+    left; known (id -> state last sent) is updated to match.
+
+    cache maps (id, old state) to an update already encoded this tick, as
+    most clients near an entity were sent the same state of it last time.
+    """
+    updates = []
+    for entity_id, state in states.items():
+        old = known.get(entity_id)
+        if old == state:
+            continue
+        update = cache.get((entity_id, old))
+        if update is not None:
+            updates.append(update)
+            known[entity_id] = state
+            continue
+        x, y, health, flags = state
+        if old is None:
+            fields = [POINT.pack(x, y), SMALL.pack(health), BITS.pack(flags)]
+            mask = POSITION | HEALTH | FLAGS
+        else:
+            fields = []
+            mask = 0
+            dx, dy = x - old[0], y - old[1]
+            if -128 <= dx < 128 and -128 <= dy < 128:
+                if dx or dy:
+                    fields.append(STEP.pack(dx, dy))
+                    mask |= MOVED
+            else:
+                fields.append(POINT.pack(x, y))
+                mask |= POSITION
+            if health != old[2]:
+                fields.append(SMALL.pack(health))
+                mask |= HEALTH
+            if flags != old[3]:
+                fields.append(BITS.pack(flags))
+                mask |= FLAGS
+        update = cache[(entity_id, old)] = id_format.pack(entity_id) + MASK.pack(mask) + b"".join(fields)
+        updates.append(update)
+        known[entity_id] = state
+    gone = [entity_id for entity_id in known if entity_id not in states]
+    for entity_id in gone:
+        del known[entity_id]
+    parts.append(COUNT.pack(len(updates)))
+    parts.extend(updates)
+    parts.append(COUNT.pack(len(gone)))
+    parts.extend(id_format.pack(entity_id) for entity_id in gone)
+
+def _decode_entities(data, offset, known, id_format):
+    """Apply one entity section to known (id -> [x, y, health, flags]);
+    returns the offset just past it"""
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        (entity_id,) = id_format.unpack_from(data, offset)
+        offset += id_format.size
+        (mask,) = MASK.unpack_from(data, offset)
+        offset += MASK.size
+        state = known.setdefault(entity_id, [0, 0, 0, 0])
+        if mask & MOVED:
+            dx, dy = STEP.unpack_from(data, offset)
+            state[0] += dx
+            state[1] += dy
+            offset += STEP.size
+        elif mask & POSITION:
+            state[0], state[1] = POINT.unpack_from(data, offset)
+            offset += POINT.size
+        if mask & HEALTH:
+            (state[2],) = SMALL.unpack_from(data, offset)
+            offset += SMALL.size
+        if mask & FLAGS:
+            (state[3],) = BITS.unpack_from(data, offset)
+            offset += BITS.size
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    for _ in range(count):
+        (entity_id,) = id_format.unpack_from(data, offset)
+        offset += id_format.size
+        known.pop(entity_id, None)
+    return offset
+
+class _Client:
+    """What the server knows about one connection"""
+    def __init__(self, player_id, writer):
+        self.player_id = player_id
+        self.writer = writer
+        self.keys = KeyState()
+        self.sequence = 0  # Latest input received
+        self.players = {}  # Player id -> state in the last snapshot sent
+        self.enemies = {}  # Enemy id -> state in the last snapshot sent
+        self.bullets = []  # World positions in the last snapshot sent
+        self.pending = []  # Collected diamond tiles not sent yet, all out of range
+        self.tile = None  # Player tile when pending was last checked
+
+class GameServer:
+    """Authoritative game server running a MultiplayerSession over TCP.
+
+    Each connection gets a player and a welcome message with the diamonds
+    still on the level; the client loads the map itself. Clients then send
+    their key mask whenever it changes, and the server applies the latest
+    one on every tick. After each tick a client is sent a snapshot of what
+    lies within radius tiles of its player: players and enemies as
+    field-wise changes against the previous snapshot it was sent, bullets
+    (which move every tick) whole unless unchanged, and diamonds collected
+    in range since it last heard of them. TCP delivers everything in order,
+    so the last snapshot written is always the base of the next; a client
+    whose send buffer backs up skips snapshots until it drains. A client
+    sending anything but input frames is disconnected.
+    """
+    def __init__(self, session, host="127.0.0.1", port=0, radius=INTEREST_RADIUS, profiler=None):
+        self.session = session
+        self.host = host
+        self.port = port  # 0 picks a free port; start() stores the one bound
+        self.radius = radius
+        self.reach = radius * session.tile_size  # Radius in pixels
+        if self.reach + 2 * session.tile_size > 0x7FFF:
+            raise ValueError("interest radius too large for 16-bit bullet offsets")
+        self.enemy_ids = {enemy: index for index, enemy in enumerate(session.enemies)}
+        self.clients = {}  # Player id -> _Client
+        # Rebuilt each tick and shared by every snapshot: entity states, and
+        # grids with interest-sized cells so an area query touches 3x3 cells
+        self._player_states = {}
+        self._enemy_states = {}
+        self._player_updates = {}  # Encoded updates, see _encode_entities()
+        self._enemy_updates = {}
+        self._player_grid = SpatialHash(self.reach)
+        self._enemy_grid = SpatialHash(self.reach)
+        self._bullet_grid = SpatialHash(self.reach)
+        self.profiler = profiler
+        session.attach_profiler(profiler)
+        self.bytes_sent = 0  # Running totals
+        self.snapshots_sent = 0
+        self._server = None
+
+    async def start(self):
+        """Listen for clients"""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        for client in list(self.clients.values()):
+            client.writer.close()
+        await self._server.wait_closed()
+        self.session.close()
+
+    async def _serve(self, reader, writer):
+        session = self.session
+        player_id = session.add_player()
+        client = self.clients[player_id] = _Client(player_id, writer)
+        self._send(client, WELCOME_HEADER.pack(WELCOME, player_id, session.tile_size, self.radius) +
+                   zlib.compress(session.diamonds.tiles))
+        try:
+            while True:
+                body = await _read_frame(reader, INPUT_BODY.size)
+                if len(body) != INPUT_BODY.size or body[0] != INPUT:
+                    raise ValueError(f"bad input frame {body[:8].hex()} ({len(body)} bytes)")
+                _, sequence, mask = INPUT_BODY.unpack(body)
+                if sequence > client.sequence:
+                    client.sequence = sequence
+                    client.keys = decode_keys(mask)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as error:
+            logger.warning("Disconnecting player %d: %s", player_id, error)
+        finally:
+            del self.clients[player_id]
+            session.remove_player(player_id)
+            writer.close()
+
+    def _send(self, client, body):
+        frame = _frame(body)
+        client.writer.write(frame)
+        self.bytes_sent += len(frame)
+
+    def tick(self):
+        """Advance the session with the latest inputs and send the snapshots"""
+        session = self.session
+        profiler = self.profiler
+        if profiler:
+            profiler.begin_frame()
+        ticks = session.ticks
+        session.step({player_id: client.keys for player_id, client in self.clients.items()})
+        if session.ticks == ticks:
+            return  # Nobody alive to play, or the game is over
+        width = session.game_map.width
+        tile_size = session.tile_size
+        collected = [rect.y // tile_size * width + rect.x // tile_size for rect in session.collected_rects]
+        self._index()
+        for client in self.clients.values():
+            client.pending.extend(collected)
+            if client.writer.transport.get_write_buffer_size() <= SEND_BUFFER_LIMIT:
+                self._send(client, self._snapshot(client))
+                self.snapshots_sent += 1
+        if profiler:
+            profiler.mark("snapshots")
+            profiler.count("clients", len(self.clients))
+            profiler.end_frame()
+
+    def _index(self):
+        session = self.session
+        players, enemies = self._player_states, self._enemy_states
+        for table in (players, enemies, self._player_updates, self._enemy_updates):
+            table.clear()
+        player_grid, enemy_grid, bullet_grid = self._player_grid, self._enemy_grid, self._bullet_grid
+        for grid in (player_grid, enemy_grid, bullet_grid):
+            grid.clear()
+        for player_id, player in session.players.items():
+            players[player_id] = _player_state(player)
+            player_grid.insert(player_id, player.hitbox)
+            pool = player.bullets
+            bullet_grid.insert_all(list(zip(pool.xs[:pool.count], pool.ys[:pool.count])),
+                                   [pool.rect(slot) for slot in range(pool.count)])
+        enemy_ids = self.enemy_ids
+        for enemy in session.enemies:
+            enemy_id = enemy_ids[enemy]
+            enemies[enemy_id] = _enemy_state(enemy)
+            enemy_grid.insert(enemy_id, enemy.hitbox)
+
+    def _snapshot(self, client):
+        session = self.session
+        player = session.players[client.player_id]
+        reach = self.reach
+        area = pygame.Rect(player.hitbox.centerx - reach, player.hitbox.centery - reach, 2 * reach, 2 * reach)
+        result = 0 if session.result is None else 1 if session.result else 2
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT, session.ticks, client.sequence, session.score, result)]
+
+        states = self._player_states
+        players = {player_id: states[player_id] for player_id in self._player_grid.query(area)}
+        _encode_entities(players, client.players, PLAYER_ID, parts, self._player_updates)
+        states = self._enemy_states
+        enemies = {enemy_id: states[enemy_id] for enemy_id in self._enemy_grid.query(area)}
+        _encode_entities(enemies, client.enemies, ENEMY_ID, parts, self._enemy_updates)
+
+        # Bullets, relative to the receiving player
+        bullets = self._bullet_grid.query(area)
+        if bullets == client.bullets:
+            parts.append(COUNT.pack(UNCHANGED))
+        else:
+            origin_x, origin_y = player.hitbox.topleft
+            parts.append(COUNT.pack(len(bullets)))
+            parts.extend(OFFSET.pack(x - origin_x, y - origin_y) for x, y in bullets)
+            client.bullets = bullets
+
+        # Diamonds collected in range; the others wait until the player
+        # comes near or changes tile
+        tile_size = session.tile_size
+        tile = (player.hitbox.centerx // tile_size, player.hitbox.centery // tile_size)
+        sent = []
+        if client.pending and (tile != client.tile or session.collected_rects):
+            client.tile = tile
+            width = session.game_map.width
+            tiles = self.radius + 1
+            far = []
+            for index in client.pending:
+                y, x = divmod(index, width)
+                (sent if abs(x - tile[0]) <= tiles and abs(y - tile[1]) <= tiles else far).append(index)
+            client.pending = far
+        parts.append(COUNT.pack(len(sent)))
+        parts.extend(TILE_INDEX.pack(index) for index in sent)
+        return b"".join(parts)
+
+    async def run(self, ticks=None, tick_rate=TICK_RATE):
+        """Tick until the game ends or ticks ticks pass; returns the result.
+
+        tick_rate=None ticks as fast as possible, still letting the clients
+        run between ticks.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        count = 0
+        while self.session.result is None and (ticks is None or count < ticks):
+            self.tick()
+            count += 1
+            if tick_rate:
+                deadline += 1 / tick_rate
+                await asyncio.sleep(max(0, deadline - loop.time()))
+            else:
+                await asyncio.sleep(0)
+        return self.session.result
+
+class GameClient:
+    """Connection to a GameServer, mirroring the state it is sent.
+
+    players and enemies map ids to [x, y, health, flags] (pixel top-left
+    of the hitbox; flags hold FACING_LEFT and RUNNING), bullets lists
+    bullet positions and diamonds is the level's DiamondField, all limited
+    to what lies around this client's player.
+    """
+    def __init__(self, map_path=DEFAULT_MAP):
+        self.map_path = map_path
+        self.player_id = None
+        self.game_map = None
+        self.diamonds = None
+        self.players = {}
+        self.enemies = {}
+        self.bullets = []
+        self.tick = 0
+        self.ack = 0  # Latest of our inputs the server applied
+        self.score = 0
+        self.result = None
+        self.bytes_received = 0
+        self._sequence = 0
+        self._mask = None
+        self._reader = self._writer = None
+
+    async def connect(self, host, port):
+        """Join the game; returns our player id"""
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        body = await self._receive_frame()
+        _, self.player_id, tile_size, self.radius = WELCOME_HEADER.unpack_from(body)
+        self.game_map = Map(self.map_path, default_tile_kinds(), tile_size)
+        tiles = bytearray(zlib.decompress(body[WELCOME_HEADER.size:]))
+        self.diamonds = DiamondField(self.game_map.width, self.game_map.height, tile_size, tiles)
+        return self.player_id
+
+    async def _receive_frame(self):
+        body = await _read_frame(self._reader, MAX_FRAME)
+        self.bytes_received += FRAME.size + len(body)
+        return body
+
+    @property
+    def player(self):
+        """Our own player's [x, y, health, flags]"""
+        return self.players.get(self.player_id)
+
+    def send(self, keys):
+        """Send our keys (any get_pressed()-style lookup) if they changed"""
+        mask = encode_keys(keys)
+        if mask != self._mask:
+            self._mask = mask
+            self._sequence += 1
+            self._writer.write(_frame(INPUT_BODY.pack(INPUT, self._sequence, mask)))
+
+    async def receive(self):
+        """Wait for the next snapshot and apply it; returns its tick"""
+        data = await self._receive_frame()
+        _, self.tick, self.ack, self.score, result = SNAPSHOT_HEADER.unpack_from(data)
+        self.result = None if result == 0 else result == 1
+        offset = _decode_entities(data, SNAPSHOT_HEADER.size, self.players, PLAYER_ID)
+        offset = _decode_entities(data, offset, self.enemies, ENEMY_ID)
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        if count != UNCHANGED:
+            origin_x, origin_y = self.player[:2]
+            self.bullets = [
+                (origin_x + dx, origin_y + dy)
+                for dx, dy in OFFSET.iter_unpack(data[offset:offset + count * OFFSET.size])
+            ]
+            offset += count * OFFSET.size
+        (count,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for (index,) in TILE_INDEX.iter_unpack(data[offset:offset + count * TILE_INDEX.size]):
+            self.diamonds.discard(index)
+        return self.tick
+
+    async def close(self):
+        if self.game_map is not None:
+            self.game_map.close()
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass  # The server closed first
+
+async def _bot(client, host, port, rng, turn_ticks=20):
+    """Play with random keys, held for turn_ticks ticks at a time"""
+    await client.connect(host, port)
+    keys = KeyState()
+    try:
+        while client.result is None:
+            tick = await client.receive()
+            if tick % turn_ticks == 0:
+                keys = KeyState(key for key in RECORDED_KEYS if rng.random() < 0.4)
+            client.send(keys)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        await client.close()
+
+async def _loopback(players, ticks, seed):
+    """Run a server and random bots over localhost; returns the server and its bots"""
+    server = GameServer(MultiplayerSession(seed=seed), profiler=FrameProfiler(history=ticks))
+    await server.start()
+    rng = random.Random(seed)
+    clients = [GameClient() for _ in range(players)]
+    bots = [asyncio.create_task(_bot(client, server.host, server.port, rng)) for client in clients]
+    while len(server.clients) < players:
+        await asyncio.sleep(0)
+    await server.run(ticks, tick_rate=None)
+    await server.close()
+    await asyncio.gather(*bots)
+    return server, clients
+
+if __name__ == "__main__":
+    # Loopback load test: python net.py [players] [ticks]
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    init_headless()
+    started = time.perf_counter()
+    server, clients = asyncio.run(_loopback(players, ticks, seed=0))
+    elapsed = time.perf_counter() - started
+    session = server.session
+    print(f"{players} players, {session.ticks} ticks in {elapsed:.2f}s, result {session.result}")
+    for line in server.profiler.summary_lines():
+        print(line)
+    print(f"{server.bytes_sent / max(1, server.snapshots_sent):.0f} bytes per snapshot")
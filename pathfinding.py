@@ -0,0 +1,474 @@
+import heapq
+from array import array
+from collections import OrderedDict, deque
+
+NEIGHBORS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+UNREACHABLE = -1
+CLUSTER_SIZE = 16  # Tiles per side of a hierarchical pathfinding cluster
+PATH_CACHE_SIZE = 4096  # Abstract paths kept by HierarchicalPathfinder
+SEARCH_SLICE = 64  # Nodes expanded between two yields of a resumable search
+
+def _run(search):
+    """Run a search generator to completion and return its result"""
+    while True:
+        try:
+            next(search)
+        except StopIteration as stop:
+            return stop.value
+
+class _SparseDistances(dict):
+    """Distances of a range-limited field; unseen tiles are unreachable"""
+    def __missing__(self, index):
+        return UNREACHABLE
+
+class FlowField:
+    """Shared BFS distance field toward a single goal tile.
+
+    The field is rebuilt only when the goal (the player's tile) changes,
+    so any number of enemies can look up their next step in O(1). With
+    max_distance, the search stops that many steps from the goal and only
+    the tiles reached are stored.
+    """
+    def __init__(self, game_map, max_distance=None):
+        self.game_map = game_map
+        self.max_distance = max_distance
+        self.width = game_map.width
+        self.height = game_map.height
+        self.distances = _SparseDistances()
+        self.goal = None
+        self.nodes_expanded = 0  # Running total, read by the frame profiler
+
+    def update(self, goal):
+        """Rebuild the distance field if the goal tile changed"""
+        if goal != self.goal:
+            _run(self._fill(goal))
+
+    def _fill(self, goal):
+        """Generator rebuilding the field toward goal, yielding every
+        SEARCH_SLICE nodes; the old field stays in use until it completes"""
+        width, height = self.width, self.height
+        if self.max_distance is None:
+            distances = [UNREACHABLE] * (width * height)
+        else:
+            distances = _SparseDistances()
+
+        gx, gy = goal
+        goal_index = gy * width + gx
+        solid = self.game_map.solid
+        if 0 <= gx < width and 0 <= gy < height and not solid[goal_index]:
+            distances[goal_index] = 0
+            size = width * height
+            max_distance = size if self.max_distance is None else self.max_distance
+            frontier = deque([goal_index])
+            expanded = 0
+            while frontier:
+                index = frontier.popleft()
+                next_distance = distances[index] + 1
+                if next_distance > max_distance:
+                    continue
+                x = index % width
+                # Up, down, left, right - stay within the grid
+                for neighbor, valid in (
+                    (index - width, index >= width),
+                    (index + width, index < size - width),
+                    (index - 1, x > 0),
+                    (index + 1, x < width - 1),
+                ):
+                    if valid and not solid[neighbor] and distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = next_distance
+                        frontier.append(neighbor)
+                self.nodes_expanded += 1
+                expanded += 1
+                if expanded % SEARCH_SLICE == 0:
+                    yield
+        self.distances = distances
+        self.goal = goal
+
+    def prepare(self, goal):
+        """Build the field ahead of the first query"""
+        self.update(goal)
+
+    def invalidate(self, x, y):
+        """Tile (x, y) changed; rebuild the field on the next query"""
+        self.goal = None
+
+    def distance(self, tile):
+        """Distance in tiles from tile to the goal, or UNREACHABLE"""
+        x, y = tile
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return UNREACHABLE
+        return self.distances[y * self.width + x]
+
+    def next_step(self, tile):
+        """Neighbouring tile one step closer to the goal, or None"""
+        current = self.distance(tile)
+        if current <= 0:
+            return None
+        x, y = tile
+        for ox, oy in NEIGHBORS:
+            neighbor = (x + ox, y + oy)
+            if self.distance(neighbor) == current - 1:
+                return neighbor
+        return None
+
+    def route(self, start, goal):
+        """Upcoming tiles from start toward goal.
+
+        Only the next step is returned; callers ask again once they reach it.
+        """
+        self.update(goal)
+        step = self.next_step(start)
+        return [step] if step else []
+
+    def search(self, start, goal):
+        """route() as a generator that yields while the field is rebuilt"""
+        if goal != self.goal:
+            yield from self._fill(goal)
+        return self.route(start, goal)
+
+class HierarchicalPathfinder:
+    """Hierarchical A* (HPA*) for maps too large for a full flow field.
+
+    The map is split into square clusters. Each run of open tiles along the
+    border of two clusters gets one entrance: a pair of facing tiles joined
+    by a step of cost 1. Inside a cluster, entrances are joined by their BFS
+    distance within the cluster. This abstract graph is built lazily, one
+    cluster at a time, and searched with A*; tiles are then only searched
+    inside single clusters to refine the part of the path being followed.
+
+    Abstract paths are cached per (start cluster, goal cluster) and reused
+    for any start and goal in those clusters that reach its ends, so most
+    queries cost a BFS inside one cluster. Entrances from which a search
+    failed are remembered, so an unreachable goal is only searched for once.
+    """
+    def __init__(self, game_map, cluster_size=CLUSTER_SIZE, cache_size=PATH_CACHE_SIZE):
+        self.game_map = game_map
+        self.width = game_map.width
+        self.height = game_map.height
+        self.cluster_size = cluster_size
+        self.cache_size = cache_size
+        self.nodes_expanded = 0  # Running total, read by the frame profiler
+        self._reset()
+
+    def _reset(self):
+        self._borders = {}  # (cluster, neighbor cluster) -> [(inside, outside) tile index pairs]
+        self._nodes = {}  # cluster -> entrance tile indices, once the cluster is built
+        self._labels = {}  # cluster -> connected area of each of its tiles, 0 if solid
+        self._edges = {}  # entrance -> {entrance: cost}
+        self._segments = {}  # (entrance, entrance) -> tiles between them within a cluster
+        self._paths = OrderedDict()  # (start cluster, goal cluster) -> entrances, oldest first
+        self._dead = {}  # Goal entrances -> entrances known not to lead to them
+        self._goal_side = (None, {})  # Last goal and the costs from its cluster's entrances to it
+
+    def prepare(self, tile):
+        """Build the clusters around tile ahead of the first query"""
+        cx, cy = self._cluster_of(tile[1] * self.width + tile[0])
+        for oy in (-1, 0, 1):
+            for ox in (-1, 0, 1):
+                self._build((cx + ox, cy + oy))
+
+    def invalidate(self, x, y):
+        """Tile (x, y) changed; drop the graph and every cached path"""
+        self._reset()
+
+    def _cluster_of(self, index):
+        y, x = divmod(index, self.width)
+        return (x // self.cluster_size, y // self.cluster_size)
+
+    def _bounds(self, cluster):
+        size = self.cluster_size
+        left, top = cluster[0] * size, cluster[1] * size
+        return left, top, min(left + size, self.width), min(top + size, self.height)
+
+    def _border(self, cluster, neighbor):
+        """Entrances from cluster into the cluster to its right or below"""
+        key = (cluster, neighbor)
+        pairs = self._borders.get(key)
+        if pairs is not None:
+            return pairs
+        pairs = []
+        self._borders[key] = pairs
+        left, top, right, bottom = self._bounds(cluster)
+        if neighbor[0] > cluster[0]:
+            if right >= self.width:
+                return pairs
+            tiles = [y * self.width + right - 1 for y in range(top, bottom)]
+            step = 1
+        else:
+            if bottom >= self.height:
+                return pairs
+            tiles = [(bottom - 1) * self.width + x for x in range(left, right)]
+            step = self.width
+        solid = self.game_map.solid
+        run = []
+        for inside in tiles + [None]:
+            if inside is not None and not solid[inside] and not solid[inside + step]:
+                run.append(inside)
+                continue
+            if run:
+                middle = run[len(run) // 2]
+                pairs.append((middle, middle + step))
+                self._edges.setdefault(middle, {})[middle + step] = 1
+                self._edges.setdefault(middle + step, {})[middle] = 1
+                run = []
+        return pairs
+
+    def _build(self, cluster):
+        """Entrances of cluster and the distances between them"""
+        nodes = self._nodes.get(cluster)
+        if nodes is not None:
+            return nodes
+        cx, cy = cluster
+        nodes = set()
+        if 0 <= cx and cx * self.cluster_size < self.width and 0 <= cy and cy * self.cluster_size < self.height:
+            for other, inside in (((cx + 1, cy), True), ((cx, cy + 1), True),
+                                  ((cx - 1, cy), False), ((cx, cy - 1), False)):
+                if inside:
+                    nodes.update(pair[0] for pair in self._border(cluster, other))
+                elif other[0] >= 0 and other[1] >= 0:
+                    nodes.update(pair[1] for pair in self._border(other, cluster))
+
+        # Adjacency of the cluster's open tiles in local indices, so the
+        # BFS from every entrance runs over plain lists
+        left, top, right, bottom = self._bounds(cluster)
+        columns = right - left
+        count = columns * (bottom - top)
+        width = self.width
+        solid = self.game_map.solid
+        is_open = [not solid[(top + local // columns) * width + left + local % columns]
+                   for local in range(count)]
+        adjacent = [[] for _ in range(count)]
+        for local in range(count):
+            if not is_open[local]:
+                continue
+            if local % columns and is_open[local - 1]:
+                adjacent[local].append(local - 1)
+                adjacent[local - 1].append(local)
+            if local >= columns and is_open[local - columns]:
+                adjacent[local].append(local - columns)
+                adjacent[local - columns].append(local)
+
+        # Connected areas of the cluster, to tell in O(1) whether two of its
+        # tiles are joined inside it
+        labels = array("H", bytes(2 * count))
+        label = 0
+        for local in range(count):
+            if is_open[local] and not labels[local]:
+                label += 1
+                labels[local] = label
+                frontier = [local]
+                for current in frontier:
+                    for neighbor in adjacent[current]:
+                        if not labels[neighbor]:
+                            labels[neighbor] = label
+                            frontier.append(neighbor)
+        self._labels[cluster] = labels
+
+        local_nodes = {node: (node // width - top) * columns + node % width - left for node in nodes}
+        for node, start in local_nodes.items():
+            distances = [UNREACHABLE] * count
+            distances[start] = 0
+            frontier = [start]
+            for current in frontier:
+                next_distance = distances[current] + 1
+                for neighbor in adjacent[current]:
+                    if distances[neighbor] == UNREACHABLE:
+                        distances[neighbor] = next_distance
+                        frontier.append(neighbor)
+            self.nodes_expanded += len(frontier)
+            edges = self._edges.setdefault(node, {})
+            for other, end in local_nodes.items():
+                if other != node and distances[end] != UNREACHABLE:
+                    edges[other] = distances[end]
+        self._nodes[cluster] = nodes
+        return nodes
+
+    def _connected(self, start, end, cluster):
+        """Whether two open tiles of a built cluster are joined inside it"""
+        left, top, right, _ = self._bounds(cluster)
+        columns = right - left
+        labels = self._labels[cluster]
+        y, x = divmod(start, self.width)
+        start_label = labels[(y - top) * columns + x - left]
+        y, x = divmod(end, self.width)
+        return start_label == labels[(y - top) * columns + x - left]
+
+    def _search_cluster(self, start, cluster, goal=None):
+        """BFS from start without leaving cluster, stopping once goal is
+        reached: (distances, parents) of the tiles reached"""
+        left, top, right, bottom = self._bounds(cluster)
+        width = self.width
+        solid = self.game_map.solid
+        distances = {start: 0}
+        parents = {start: None}
+        frontier = deque([start])
+        while frontier:
+            index = frontier.popleft()
+            if index == goal:
+                break
+            y, x = divmod(index, width)
+            next_distance = distances[index] + 1
+            for neighbor, valid in (
+                (index - width, y > top),
+                (index + width, y < bottom - 1),
+                (index - 1, x > left),
+                (index + 1, x < right - 1),
+            ):
+                if valid and neighbor not in distances and not solid[neighbor]:
+                    distances[neighbor] = next_distance
+                    parents[neighbor] = index
+                    frontier.append(neighbor)
+            self.nodes_expanded += 1
+        return distances, parents
+
+    def _local_path(self, start, goal, cluster):
+        """Tiles after start up to goal without leaving cluster, or None"""
+        parents = self._search_cluster(start, cluster, goal)[1]
+        if goal not in parents:
+            return None
+        path = []
+        while goal != start:
+            path.append(goal)
+            goal = parents[goal]
+        path.reverse()
+        return path
+
+    def _abstract_path(self, start, goal):
+        """Generator returning the entrances from start's cluster to
+        goal's, or None if unreachable"""
+        start_cluster = self._cluster_of(start)
+        goal_cluster = self._cluster_of(goal)
+        key = (start_cluster, goal_cluster)
+        cached = self._paths.get(key)
+        start_nodes = self._build(start_cluster)
+        goal_nodes = self._build(goal_cluster)
+        if (cached is not None and self._connected(start, cached[0], start_cluster) and
+                self._connected(cached[-1], goal, goal_cluster)):
+            self._paths.move_to_end(key)
+            return cached
+
+        # Every enemy chases the same goal, so its side is worked out once
+        if self._goal_side[0] != goal:
+            reached = self._search_cluster(goal, goal_cluster)[0]
+            self._goal_side = (goal, {node: reached[node] for node in goal_nodes if node in reached})
+        goal_costs = self._goal_side[1]
+        dead = self._dead.setdefault(frozenset(goal_costs), set())
+        if not any(node not in dead and self._connected(start, node, start_cluster)
+                   for node in start_nodes):
+            return None
+        reached = self._search_cluster(start, start_cluster)[0]
+        start_costs = {node: reached[node] for node in start_nodes
+                       if node in reached and node not in dead}
+
+        # A* over the entrances; GOAL stands for goal itself, reached
+        # from any entrance of its cluster that it can walk to
+        GOAL = -1
+        gy, gx = divmod(goal, self.width)
+        best = dict(start_costs)
+        parents = dict.fromkeys(start_costs)
+        frontier = []
+        for node, cost in start_costs.items():
+            y, x = divmod(node, self.width)
+            heapq.heappush(frontier, (cost + abs(x - gx) + abs(y - gy), cost, node))
+        next_yield = self.nodes_expanded + SEARCH_SLICE
+        while frontier:
+            _, cost, node = heapq.heappop(frontier)
+            if node == GOAL:
+                break
+            if cost > best[node]:
+                continue
+            if self.nodes_expanded >= next_yield:
+                yield
+                next_yield = self.nodes_expanded + SEARCH_SLICE
+            self.nodes_expanded += 1
+            self._build(self._cluster_of(node))
+            neighbors = list(self._edges[node].items())
+            if node in goal_costs:
+                neighbors.append((GOAL, goal_costs[node]))
+            for neighbor, step in neighbors:
+                new_cost = cost + step
+                if new_cost < best.get(neighbor, new_cost + 1):
+                    best[neighbor] = new_cost
+                    parents[neighbor] = node
+                    if neighbor == GOAL:
+                        estimate = new_cost
+                    else:
+                        y, x = divmod(neighbor, self.width)
+                        estimate = new_cost + abs(x - gx) + abs(y - gy)
+                    heapq.heappush(frontier, (estimate, new_cost, neighbor))
+        else:
+            # Nothing reached can lead to the goal's entrances
+            dead.update(best)
+            return None
+
+        path = []
+        node = parents[GOAL]
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        path.reverse()
+        self._paths[key] = path
+        if len(self._paths) > self.cache_size:
+            self._paths.popitem(last=False)
+        return path
+
+    def _segment(self, start, end):
+        """Tiles after start up to end, two consecutive path waypoints"""
+        if self._cluster_of(start) != self._cluster_of(end):
+            return [end]  # Facing entrances of two clusters
+        key = (start, end)
+        path = self._segments.get(key)
+        if path is None:
+            path = self._local_path(start, end, self._cluster_of(start)) or []
+            if end in self._edges.get(start, ()):
+                self._segments[key] = path  # Only entrance pairs recur
+        return path
+
+    def find_path(self, start, goal, first_cluster_only=False):
+        """Tiles from start (excluded) to goal (included); [] if unreachable.
+
+        With first_cluster_only, stop at the first tile outside the start
+        tile's cluster.
+        """
+        return _run(self._find(start, goal, first_cluster_only))
+
+    def _find(self, start, goal, first_cluster_only):
+        width, height = self.width, self.height
+        if not (0 <= start[0] < width and 0 <= start[1] < height and
+                0 <= goal[0] < width and 0 <= goal[1] < height):
+            return []
+        start = start[1] * width + start[0]
+        goal = goal[1] * width + goal[0]
+        solid = self.game_map.solid
+        if start == goal or solid[start] or solid[goal]:
+            return []
+
+        start_cluster = self._cluster_of(start)
+        path = None
+        if start_cluster == self._cluster_of(goal):
+            path = self._local_path(start, goal, start_cluster)
+        if path is None:
+            waypoints = yield from self._abstract_path(start, goal)
+            if waypoints is None:
+                return []
+            path = []
+            current = start
+            for waypoint in waypoints + [goal]:
+                if waypoint != current:
+                    path.extend(self._segment(current, waypoint))
+                    current = waypoint
+                    if first_cluster_only and self._cluster_of(current) != start_cluster:
+                        break
+        return [divmod(index, width)[::-1] for index in path]
+
+    def route(self, start, goal):
+        """Upcoming tiles from start toward goal.
+
+        Only the tiles up to the next cluster are returned; callers ask
+        again once they have walked them.
+        """
+        return self.find_path(start, goal, first_cluster_only=True)
+
+    def search(self, start, goal):
+        """route() as a generator that yields every SEARCH_SLICE nodes"""
+        return self._find(start, goal, True)
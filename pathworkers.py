@@ -0,0 +1,96 @@
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+class _SharedMap:
+    """The parts of a Map a pathfinder reads, over the shared solidity mask"""
+    def __init__(self, width, height, solid):
+        self.width = width
+        self.height = height
+        self.solid = solid
+
+_pathfinder = None  # This worker process's pathfinder
+_shared = None  # Kept open for as long as the worker lives
+
+def _init_worker(name, width, height, pathfinder_type):
+    global _pathfinder, _shared
+    _shared = shared_memory.SharedMemory(name=name)
+    _pathfinder = pathfinder_type(_SharedMap(width, height, _shared.buf))
+
+def _route_batch(queries):
+    """Routes for a list of (start, goal) tiles, in a worker process"""
+    return [_pathfinder.route(start, goal) for start, goal in queries]
+
+class PathWorkerPool:
+    """Searches enemy paths in worker processes, off the game's core.
+
+    Has PathScheduler's interface: enemies request() paths, and tick()
+    sends the queued requests to the workers in batches and applies the
+    routes that came back since the last tick. The map's solidity mask is
+    copied once into shared memory that every worker reads; each worker
+    builds its own pathfinder of the map's kind over it, so later
+    set_tile() changes are not seen by the workers.
+
+    Results arrive after a timing-dependent number of ticks, so games
+    played with a pool cannot be replayed exactly.
+    """
+    def __init__(self, game_map, workers=None, batch_size=64):
+        if not isinstance(game_map.solid, bytearray):
+            raise ValueError("worker pools need a map loaded in memory")
+        self.batch_size = batch_size
+        self.view = None  # Unused; requests are all sent on the next tick
+        self._shared = shared_memory.SharedMemory(create=True, size=max(1, len(game_map.solid)))
+        self._shared.buf[:len(game_map.solid)] = game_map.solid
+        # Workers only import the pathfinding modules, not pygame
+        self._executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._shared.name, game_map.width, game_map.height, type(game_map.pathfinder)))
+        self._finalizer = weakref.finalize(self, _release, self._executor, self._shared)
+        self._goals = {}  # Enemy -> goal tile of its latest request not sent yet
+        self._in_flight = []  # (future, enemies of its batch)
+        self._busy = set()  # Enemies with a request in flight
+        self.completed = 0  # Running total, read by the frame profiler
+
+    def __len__(self):
+        return len(self._busy.union(self._goals))
+
+    def request(self, enemy, goal):
+        """Queue a path from enemy's tile to goal; it is sent once the
+        enemy has no other request in flight"""
+        self._goals[enemy] = goal
+
+    def cancel(self, enemy):
+        self._goals.pop(enemy, None)
+        self._busy.discard(enemy)
+
+    def tick(self):
+        """Apply finished routes, then send the queued requests"""
+        still_running = []
+        for future, enemies in self._in_flight:
+            if not future.done():
+                still_running.append((future, enemies))
+                continue
+            for enemy, route in zip(enemies, future.result()):
+                if enemy in self._busy:
+                    enemy.path = route
+                    self._busy.discard(enemy)
+                    self.completed += 1
+        self._in_flight = still_running
+
+        ready = [enemy for enemy in self._goals if enemy not in self._busy]
+        for first in range(0, len(ready), self.batch_size):
+            enemies = ready[first:first + self.batch_size]
+            queries = [(enemy.tile(), self._goals.pop(enemy)) for enemy in enemies]
+            self._in_flight.append((self._executor.submit(_route_batch, queries), enemies))
+            self._busy.update(enemies)
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        self._finalizer()
+
+def _release(executor, shared):
+    executor.shutdown(wait=True, cancel_futures=True)
+    shared.close()
+    shared.unlink()
@@ -0,0 +1,106 @@
+import csv
+import json
+import time
+from collections import deque
+import pygame
+
+class FrameProfiler:
+    """Per-frame phase timings and counters with rolling percentiles.
+
+    Callers hold a reference that is None when profiling is off and guard
+    each hook with `if profiler:`, so disabled profiling costs one check.
+    """
+    def __init__(self, history=240, trace=False):
+        self.frames = deque(maxlen=history)  # Recent frame rows for the overlay
+        self.trace = [] if trace else None  # Every frame row, for dump()
+        self.watches = {}
+        self._watch_values = {}
+        self._row = None
+        self._start = self._last = 0.0
+
+    def watch(self, name, getter):
+        """Report the per-frame increase of a cumulative counter"""
+        self.watches[name] = getter
+        self._watch_values[name] = getter()
+
+    def begin_frame(self):
+        self._row = {"frame_ms": 0.0}
+        self._last = time.perf_counter()
+        self._start = self._last
+
+    def mark(self, phase):
+        """Charge the time since the previous mark to phase"""
+        now = time.perf_counter()
+        row = self._row
+        row[phase] = row.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def count(self, name, amount=1):
+        self._row[name] = self._row.get(name, 0) + amount
+
+    def end_frame(self):
+        row = self._row
+        row["frame_ms"] = (time.perf_counter() - self._start) * 1000
+        for name, getter in self.watches.items():
+            value = getter()
+            row[name] = value - self._watch_values[name]
+            self._watch_values[name] = value
+        self.frames.append(row)
+        if self.trace is not None:
+            self.trace.append(row)
+
+    def percentile(self, key, percent):
+        values = sorted(frame.get(key, 0) for frame in self.frames)
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+    def average(self, key):
+        if not self.frames:
+            return 0.0
+        return sum(frame.get(key, 0) for frame in self.frames) / len(self.frames)
+
+    def summary_lines(self):
+        lines = [
+            "frame ms  p50 {:.2f}  p95 {:.2f}  p99 {:.2f}".format(
+                self.percentile("frame_ms", 50),
+                self.percentile("frame_ms", 95),
+                self.percentile("frame_ms", 99))
+        ]
+        keys = []
+        for frame in self.frames:
+            for key in frame:
+                if key != "frame_ms" and key not in keys:
+                    keys.append(key)
+        for key in keys:
+            lines.append(f"{key:<16}{self.average(key):8.2f}")
+        return lines
+
+    def draw_overlay(self, screen, font):
+        lines = [font.render(line, True, (255, 255, 0)) for line in self.summary_lines()]
+        width = max(line.get_width() for line in lines) + 10
+        height = sum(line.get_height() for line in lines) + 10
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        y = 5
+        for line in lines:
+            panel.blit(line, (5, y))
+            y += line.get_height()
+        return screen.blit(panel, (screen.get_width() - width - 10, 10))
+
+    def dump(self, path):
+        """Write the trace as JSON (.json) or CSV (anything else)"""
+        rows = self.trace if self.trace is not None else list(self.frames)
+        if path.endswith(".json"):
+            with open(path, "w") as file:
+                json.dump(rows, file)
+            return
+        fields = []
+        for row in rows:
+            for key in row:
+                if key not in fields:
+                    fields.append(key)
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fields, restval=0)
+            writer.writeheader()
+            writer.writerows(rows)
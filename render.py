@@ -0,0 +1,58 @@
+import pygame
+
+class DirtyRenderer:
+    """Redraws and pushes to the display only the parts of the screen
+    that changed since the last frame.
+
+    Everything drawn last frame (sprites, bullets, HUD) is erased by
+    restoring the cached map and diamond layers under it. Entities are
+    then drawn at their new positions, and only the union of old and new
+    areas is sent to pygame.display.update(). A scrolling camera forces a
+    full redraw on the frames where it moves.
+    """
+    def __init__(self, screen, background=(0, 0, 0)):
+        self.screen = screen
+        self.background = background
+        self.previous = []
+        self.previous_offset = None
+
+    def _restore(self, session, rect, offset):
+        screen = self.screen
+        screen.set_clip(rect)
+        screen.fill(self.background)
+        session.game_map.draw(screen, offset)
+        session.diamonds.draw(screen, offset)
+        screen.set_clip(None)
+
+    def render(self, session, draw_hud=None, camera=None, profiler=None):
+        """Draw one frame. draw_hud(screen) may return extra areas drawn on top.
+
+        With a profiler, drawing is charged to "render" before the display
+        update, which the caller marks itself.
+        """
+        screen = self.screen
+        view = camera.rect if camera else None
+        offset = camera.offset if camera else (0, 0)
+        if offset != self.previous_offset:
+            screen.fill(self.background)
+            session.game_map.draw(screen, offset)
+            session.diamonds.draw(screen, offset)
+            erased = [screen.get_rect()]
+        else:
+            collected = [rect.move(-offset[0], -offset[1]) for rect in session.collected_rects]
+            erased = self.previous + collected
+            for rect in erased:
+                self._restore(session, rect, offset)
+
+        drawn = list(session.player.bullets.draw(screen, offset, view))
+        for enemy in session.visible_enemies(view):
+            drawn.append(enemy.draw(screen, offset))
+        drawn.append(session.player.draw(screen, offset))
+        if draw_hud:
+            drawn.extend(draw_hud(screen))
+
+        if profiler:
+            profiler.mark("render")
+        pygame.display.update(erased + drawn)
+        self.previous = drawn
+        self.previous_offset = offset
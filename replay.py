@@ -0,0 +1,85 @@
+import struct
+import sys
+import time
+import pygame
+from session import GameSession, KeyState, TICK_RATE, init_headless
+
+# Keys read by Player.handle_movement, one bit each in a recorded tick
+RECORDED_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+
+# Magic, version, seed, tick count, SHA-1 of the final state; then one byte per tick
+HEADER = struct.Struct("<4sBQI20s")
+MAGIC = b"FGRP"
+VERSION = 5
+
+def encode_keys(keys):
+    """Pack the recorded keys of a get_pressed()-style lookup into a byte"""
+    mask = 0
+    for bit, key in enumerate(RECORDED_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+def decode_keys(mask):
+    return KeyState(key for bit, key in enumerate(RECORDED_KEYS) if mask & (1 << bit))
+
+class Recording:
+    """Seed plus per-tick key masks of one game"""
+    def __init__(self, seed, masks=None, final_hash=None):
+        self.seed = seed
+        self.masks = bytearray() if masks is None else masks
+        self.final_hash = final_hash
+
+    def record(self, keys):
+        """Store this tick's keys; returns the KeyState the game should use"""
+        mask = encode_keys(keys)
+        self.masks.append(mask)
+        return decode_keys(mask)
+
+    def save(self, path):
+        digest = bytes.fromhex(self.final_hash) if self.final_hash else bytes(20)
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, self.seed, len(self.masks), digest))
+            file.write(self.masks)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, version, seed, count, digest = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} recording")
+        masks = bytearray(data[HEADER.size:HEADER.size + count])
+        if len(masks) != count:
+            raise ValueError(f"{path} is truncated")
+        final_hash = digest.hex() if any(digest) else None
+        return cls(seed, masks, final_hash)
+
+def replay(recording, speed=None, **options):
+    """Re-run a recording headless; returns (session, final hash matches).
+
+    speed=None runs as fast as possible, otherwise at speed x real time.
+    options go to GameSession and must match those of the recorded game.
+    """
+    session = GameSession(sound=False, seed=recording.seed, **options)
+    clock = pygame.time.Clock() if speed else None
+    for mask in recording.masks:
+        if session.step(decode_keys(mask)) is not None:
+            break
+        if clock:
+            clock.tick(TICK_RATE * speed)
+    matches = recording.final_hash is None or session.state_hash() == recording.final_hash
+    return session, matches
+
+if __name__ == "__main__":
+    # python replay.py game.rec [speed]
+    init_headless()
+    recording = Recording.load(sys.argv[1])
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    started = time.perf_counter()
+    session, matches = replay(recording, speed)
+    elapsed = time.perf_counter() - started
+    realtime = session.ticks / TICK_RATE
+    print(f"{session.ticks} ticks in {elapsed:.2f}s ({realtime / elapsed:.0f}x real time)")
+    print(f"final state {session.state_hash()} {'OK' if matches else 'MISMATCH'}")
+    sys.exit(0 if matches else 1)
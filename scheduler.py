@@ -0,0 +1,75 @@
+import heapq
+import time
+
+DEFAULT_NODE_BUDGET = 2000  # Search nodes expanded per tick, across all enemies
+
+class PathScheduler:
+    """Runs enemy path requests from one queue within a per-tick budget.
+
+    Enemies call request() when they need a new path; tick() then resumes
+    the unfinished search, if any, and starts queued ones, on-screen and
+    nearest enemies first, until node_budget nodes have been expanded (or
+    time_budget milliseconds have passed). Searches are the pathfinder's
+    search() generators, so a long one simply continues on the next tick.
+
+    The node budget keeps the game deterministic for replays; a time budget
+    makes results depend on the machine.
+    """
+    def __init__(self, pathfinder, node_budget=DEFAULT_NODE_BUDGET, time_budget=None):
+        self.pathfinder = pathfinder
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.view = None  # World-pixel rect on screen; enemies in it go first
+        self._queue = []  # (priority, order, enemy)
+        self._goals = {}  # Queued enemy -> goal tile of its latest request
+        self._order = 0
+        self._current = None  # (enemy, search generator) being resumed
+        self.completed = 0  # Running total, read by the frame profiler
+
+    def __len__(self):
+        return len(self._goals) + (self._current is not None)
+
+    def request(self, enemy, goal):
+        """Queue a path from enemy's tile to goal; repeated requests by a
+        queued enemy only update its goal"""
+        if enemy in self._goals:
+            self._goals[enemy] = goal
+            return
+        self._goals[enemy] = goal
+        x, y = enemy.tile()
+        on_screen = self.view is None or self.view.colliderect(enemy.hitbox)
+        priority = (not on_screen, abs(x - goal[0]) + abs(y - goal[1]))
+        heapq.heappush(self._queue, (priority, self._order, enemy))
+        self._order += 1
+
+    def cancel(self, enemy):
+        """Drop enemy's request, queued or being searched, e.g. when it dies"""
+        self._goals.pop(enemy, None)
+        if self._current is not None and self._current[0] is enemy:
+            self._current = None
+
+    def tick(self):
+        """Work through the queue until this tick's budget is spent"""
+        pathfinder = self.pathfinder
+        node_limit = pathfinder.nodes_expanded + self.node_budget
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget / 1000
+        while pathfinder.nodes_expanded < node_limit:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self._current is None:
+                if not self._queue:
+                    break
+                _, _, enemy = heapq.heappop(self._queue)
+                goal = self._goals.pop(enemy, None)
+                if goal is None:
+                    continue  # Cancelled
+                self._current = (enemy, pathfinder.search(enemy.tile(), goal))
+            enemy, search = self._current
+            try:
+                next(search)
+            except StopIteration as stop:
+                enemy.path = stop.value
+                self._current = None
+                self.completed += 1
@@ -0,0 +1,583 @@
+import hashlib
+import os
+import random
+import struct
+import sys
+import time
+import pygame
+from map import Map, TileKind
+from soldier import Player
+from enemies import Enemy, EnemyPool
+from collision import check_collision_with_enemies
+from diamonds import DiamondField
+from spatial import SpatialHash
+from assets import assets
+from animation import AnimationManager
+from scheduler import PathScheduler, DEFAULT_NODE_BUDGET
+from pathworkers import PathWorkerPool
+
+TILE_SIZE = 32
+TICK_RATE = 60  # Simulation ticks per second of game time
+DEFAULT_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "start.map")
+ENEMY_SPAWNS = [(5, 3), (8, 7), (13, 13), (13, 15), (13, 17), (16, 1)]
+WAKE_DISTANCE = 3  # Tiles from a player within which dormant enemies wake, seen or not
+STAY_AWAKE = 3 * TICK_RATE  # Ticks a woken enemy keeps moving once out of sight
+
+def default_tile_kinds():
+    return [
+        TileKind("floor", (200, 200, 200), False),
+        TileKind("wall", (50, 50, 50), True),
+        TileKind("start", (0, 255, 0), False),
+        TileKind("end", (255, 0, 0), False)
+    ]
+
+def init_headless(size=(1, 1)):
+    """Initialise pygame without a window or sound card (SDL dummy drivers).
+
+    A display surface is still created because sprites need convert_alpha().
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    return pygame.display.set_mode(size)
+
+class KeyState:
+    """Pressed-key lookup usable wherever pygame.key.get_pressed() is"""
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class Level:
+    """Everything a GameSession needs that can be built off the main thread"""
+    def __init__(self, seed, tile_size, game_map, enemy_tiles, enemy_rng, diamonds):
+        self.seed = seed
+        self.tile_size = tile_size
+        self.game_map = game_map
+        self.enemy_tiles = enemy_tiles
+        self.enemy_rng = enemy_rng  # Generator the enemies draw from
+        self.diamonds = diamonds
+
+def prepare_level(map_path=DEFAULT_MAP, tile_size=TILE_SIZE, enemy_tiles=ENEMY_SPAWNS,
+                  diamond_density=0.15, seed=None, progress=None):
+    """Parse the map, prepare pathfinding around the start tile and place
+    the diamonds.
+
+    Touches no display state, so it can run on a worker thread.
+    progress(fraction, stage) is called as each stage completes.
+    """
+    report = progress or (lambda fraction, stage: None)
+    # All randomness derives from one seed so a seed plus the per-tick
+    # inputs reproduce a game exactly. Enemies and diamonds each get their
+    # own generator, so neither depends on how much the other draws
+    seed = random.getrandbits(32) if seed is None else seed
+    seeds = random.Random(seed)
+    enemy_seed, diamond_seed = seeds.getrandbits(32), seeds.getrandbits(32)
+
+    # Chargement de la carte
+    game_map = Map(map_path, default_tile_kinds(), tile_size)
+    report(1 / 3, "map")
+
+    start_x, start_y = game_map.start_pos
+    game_map.pathfinder.prepare((start_x // tile_size, start_y // tile_size))
+    report(2 / 3, "paths")
+
+    diamonds = DiamondField.scatter(game_map, tile_size, diamond_density, random.Random(diamond_seed))
+    report(1.0, "diamonds")
+    return Level(seed, tile_size, game_map, list(enemy_tiles), random.Random(enemy_seed), diamonds)
+
+class GameSession:
+    """One level of the game, advanced one fixed tick at a time.
+
+    step() runs the simulation only; draw() renders the current state, so
+    the session runs the same way in run_game and headless. A Level made
+    by prepare_level() replaces the map, spawn, density and seed arguments.
+    Enemy paths are searched path_budget nodes per tick at most; with
+    path_budget=None each enemy searches as soon as it needs a path.
+    path_workers > 0 searches them in that many processes instead (not
+    replayable; call close() when done). enemy_pool=True stores the enemies
+    in an EnemyPool, for levels with very many of them. With dormancy=True,
+    enemies only move while within WAKE_DISTANCE tiles or in the line of
+    sight of the player, and STAY_AWAKE ticks after that, so large levels
+    cost per enemy near the player rather than per enemy.
+    """
+    def __init__(self, map_path=DEFAULT_MAP, tile_size=TILE_SIZE,
+                 enemy_tiles=ENEMY_SPAWNS, diamond_density=0.15, sound=True, seed=None,
+                 level=None, path_budget=DEFAULT_NODE_BUDGET, path_workers=0, enemy_pool=False,
+                 dormancy=False):
+        if level is None:
+            level = prepare_level(map_path, tile_size, enemy_tiles, diamond_density, seed)
+        self.tile_size = tile_size = level.tile_size
+        self.seed = level.seed
+
+        # Chargement des effets sonores
+        self.sounds = {}
+        if sound:
+            for name in ("death", "diamond"):
+                self.sounds[name] = assets.sound(os.path.join("sounds", f"{name}.wav"), volume=0.5)
+
+        self.game_map = level.game_map
+
+        # Initialisation des entités
+        self.player = Player(self.game_map.start_pos[0], self.game_map.start_pos[1], tile_size)
+        self.enemy_pool = None
+        if enemy_pool:
+            self.enemy_pool = EnemyPool(tile_size, self.game_map)
+            self.enemies = [
+                self.enemy_pool.spawn(x * tile_size, y * tile_size, level.enemy_rng)
+                for x, y in level.enemy_tiles
+            ]
+        else:
+            self.enemies = [
+                Enemy(x * tile_size, y * tile_size, tile_size, self.game_map, level.enemy_rng)
+                for x, y in level.enemy_tiles
+            ]
+        self.diamonds = level.diamonds
+
+        # Path requests go through one queue with a per-tick node budget, or
+        # to worker processes; refresh timers are spread over the interval
+        # instead of all expiring on the same tick
+        self.paths = None
+        if path_workers:
+            self.paths = PathWorkerPool(self.game_map, path_workers)
+        elif path_budget:
+            self.paths = PathScheduler(self.game_map.pathfinder, path_budget)
+        if self.enemy_pool is not None:
+            pool = self.enemy_pool
+            pool.paths = self.paths
+            if self.paths is not None:
+                for slot in range(pool.count):
+                    pool.timers[slot] = slot * pool.path_update_interval // pool.count
+        elif self.paths is not None:
+            for index, enemy in enumerate(self.enemies):
+                enemy.paths = self.paths
+                enemy.path_update_timer = index * enemy.path_update_interval // len(self.enemies)
+
+        # Dormant enemies start asleep and are woken before they first move
+        self.visibility = None
+        if dormancy:
+            self.visibility = self.game_map.visibility
+            for enemy in self.enemies:
+                enemy.awake_until = 0
+        self.active_enemies = len(self.enemies)  # Enemies that moved during the last tick
+
+        # Every entity animation is advanced in one pass per tick; pooled
+        # enemies advance their own
+        self.animations = AnimationManager()
+        for entity in [self.player] + (self.enemies if self.enemy_pool is None else []):
+            for animation in entity.animations.values():
+                self.animations.add(animation)
+        self.view = None  # World-pixel rect on screen; None means everything is
+
+        # Broadphase: enemies are re-registered every tick, or only those
+        # that moved or died when the others lie dormant
+        self.enemy_grid = SpatialHash(tile_size)
+        self._grid_rects = {}  # Enemy -> rect it is registered with, with dormancy
+        self._moved = list(self.enemies)  # Enemies updated during the last tick
+        self._removed = []  # Enemies dropped during the last tick
+        self._rebuild_enemy_grid()
+
+        self.collected_rects = []  # Diamonds picked up during the last tick
+        self.score = 0
+        self.ticks = 0
+        self.result = None  # None while playing, then True (won) or False (lost)
+        self.profiler = None
+
+    def attach_profiler(self, profiler):
+        """Time each phase of step() with a FrameProfiler, or None to stop"""
+        self.profiler = profiler
+        if profiler:
+            profiler.watch("path_nodes", lambda: self.game_map.pathfinder.nodes_expanded)
+            if self.paths is not None:
+                profiler.watch("paths_done", lambda: self.paths.completed)
+            if self.visibility is not None:
+                profiler.watch("views_computed", lambda: self.visibility.views_computed)
+
+    def close(self):
+        """Release the path worker processes, if any, and the map's file"""
+        if isinstance(self.paths, PathWorkerPool):
+            self.paths.close()
+        self.game_map.close()
+
+    def _play(self, name):
+        sound = self.sounds.get(name)
+        if sound is not None:
+            sound.play()
+
+    def _rebuild_enemy_grid(self):
+        if self.visibility is not None:
+            self._refresh_enemy_grid()
+            return
+        self.enemy_grid.clear()
+        if self.enemy_pool is not None:
+            self.enemy_grid.insert_all(self.enemy_pool.views, self.enemy_pool.rects())
+            return
+        for enemy in self.enemies:
+            self.enemy_grid.insert(enemy, enemy.hitbox)
+
+    def _refresh_enemy_grid(self):
+        grid = self.enemy_grid
+        rects = self._grid_rects
+        for enemy in self._moved:
+            rect = tuple(enemy.hitbox)
+            old = rects.get(enemy)
+            if rect != old:
+                if old is not None:
+                    grid.remove(enemy, old)
+                grid.insert(enemy, rect)
+                rects[enemy] = rect
+        for enemy in self._removed:
+            grid.remove(enemy, rects.pop(enemy))
+
+    def step(self, keys):
+        """Advance the game by one tick; returns self.result"""
+        if self.result is not None:
+            return self.result
+        self.ticks += 1
+        self.collected_rects = []
+        player = self.player
+        profiler = self.profiler
+
+        # Mise à jour du joueur
+        self._move_player(player, keys)
+        if profiler:
+            profiler.mark("input")
+
+        # Gestion des balles
+        self._shoot_enemies(player.bullets)
+        if profiler:
+            profiler.mark("bullets")
+            profiler.count("bullet_count", player.bullets.count)
+
+        # Mise à jour des ennemis
+        self._advance_enemies()
+        if profiler:
+            profiler.mark("enemies")
+            profiler.count("enemy_count", len(self.enemies))
+            profiler.count("active_enemies", self.active_enemies)
+        self._rebuild_enemy_grid()
+
+        # Collisions joueur-ennemi
+        if self._touch_enemies(player):
+            self._play("death")
+            self.result = False
+            return self.result
+        if profiler:
+            profiler.mark("collision")
+
+        # Collecte des diamants
+        self._collect_diamonds(player)
+        if profiler:
+            profiler.mark("diamonds")
+
+        # Condition de victoire
+        if self._on_end_tile(player):
+            self.result = True
+        return self.result
+
+    def _move_player(self, player, keys):
+        player.handle_movement(keys, self.game_map)
+        if self.profiler:
+            self.profiler.count("collision_tests", 2)  # One sweep per axis
+        tile_x, tile_y = player.hitbox.centerx // self.tile_size, player.hitbox.centery // self.tile_size
+        self.game_map.focus(tile_x, tile_y)
+        self.diamonds.focus(tile_x, tile_y)
+
+    def _shoot_enemies(self, bullets):
+        """Move a player's bullets; each one hitting a live enemy wounds it"""
+        if self.profiler:
+            self.profiler.count("collision_tests", 2 * bullets.count)
+        bullets.update(self.game_map)
+        for slot in range(bullets.count - 1, -1, -1):
+            for enemy in self.enemy_grid.query(bullets.rect(slot)):
+                if enemy.health > 0:
+                    enemy.health -= 1
+                    if enemy.health <= 0:
+                        self.score += 20
+                    bullets.kill(slot)
+                    break
+
+    def _advance_enemies(self):
+        if self.visibility is not None:
+            self._wake_enemies()
+        if self.enemy_pool is not None:
+            self._update_enemy_pool()
+        else:
+            self._update_enemies()
+        if self.paths is not None:
+            self.paths.view = self.view
+            self.paths.tick()
+        self.animations.advance(1 / TICK_RATE)
+
+    def _touch_enemies(self, player):
+        """Wound player if an enemy touches it; True if that killed it"""
+        if check_collision_with_enemies(player.hitbox, self.enemies, self.enemy_grid):
+            player.take_damage(1)
+            return player.health <= 0
+        return False
+
+    def _collect_diamonds(self, player):
+        for rect in self.diamonds.collect(player.hitbox):
+            self.score += 10
+            self.collected_rects.append(rect)
+            self._play("diamond")
+
+    def _on_end_tile(self, player):
+        tile_x = player.hitbox.centerx // self.tile_size
+        tile_y = player.hitbox.centery // self.tile_size
+        game_map = self.game_map
+        return (0 <= tile_y < game_map.height and 0 <= tile_x < game_map.width and
+                game_map.tile_at(tile_x, tile_y) == 3)
+
+    def _target(self, enemy):
+        """The player enemy chases"""
+        return self.player
+
+    def _live_players(self):
+        return [self.player]
+
+    def _wake_enemies(self):
+        """Keep the enemies near each player, or in its line of sight,
+        awake for STAY_AWAKE more ticks"""
+        visibility = self.visibility
+        tile_size = self.tile_size
+        reach = visibility.radius * tile_size
+        awake_until = self.ticks + STAY_AWAKE
+        for player in self._live_players():
+            origin_x = player.hitbox.centerx // tile_size
+            origin_y = player.hitbox.centery // tile_size
+            view = visibility.view((origin_x, origin_y))
+            # Only enemies in the window of the view can be seen
+            area = pygame.Rect((origin_x * tile_size - reach, origin_y * tile_size - reach),
+                               (2 * reach + tile_size, 2 * reach + tile_size))
+            for enemy in self.enemy_grid.query(area):
+                x, y = enemy.tile()
+                if max(abs(x - origin_x), abs(y - origin_y)) > WAKE_DISTANCE:
+                    index = visibility.offset((origin_x, origin_y), (x, y))
+                    if index < 0 or not view[index]:
+                        continue
+                enemy.awake_until = awake_until
+
+    def _update_enemies(self):
+        """Enemy objects: drop the dead and update the rest one by one"""
+        remaining_enemies = []
+        moved = []
+        removed = []
+        target = self._target
+        ticks = self.ticks
+        for enemy in self.enemies:
+            if enemy.health > 0:
+                remaining_enemies.append(enemy)
+                if enemy.awake_until >= ticks:  # Dormant otherwise
+                    moved.append(enemy)
+                    enemy.update(target(enemy))
+                continue
+            if self.paths is not None:
+                self.paths.cancel(enemy)
+            for animation in enemy.animations.values():
+                self.animations.remove(animation)
+            removed.append(enemy)
+        self.enemies = remaining_enemies
+        self.active_enemies = len(moved)
+        if self.profiler:
+            self.profiler.count("collision_tests", len(moved))  # At most one per enemy walking
+        self._moved, self._removed = moved, removed
+
+        # Animations: looping ones of off-screen enemies are skipped
+        view = self.view
+        if view is not None:
+            for enemy in remaining_enemies:
+                enemy.current_anim.visible = view.colliderect(enemy.hitbox)
+
+    def _update_enemy_pool(self):
+        """Pooled enemies: drop the dead, then move the rest in one pass"""
+        pool = self.enemy_pool
+        removed = pool.remove_dead()
+        for enemy in removed:
+            if self.paths is not None:
+                self.paths.cancel(enemy)
+        slots = pool.update(self.player, self.ticks)
+        self.active_enemies = len(slots)
+        if self.profiler:
+            self.profiler.count("collision_tests", pool.wall_tests)
+        self.enemies = list(pool.views)
+        if self.visibility is not None:
+            self._moved = [pool.views[slot] for slot in slots]
+            self._removed = removed
+
+    def _all_players(self):
+        return [self.player]
+
+    def state_hash(self):
+        """Hex digest of the simulation state, for replay checks"""
+        players = self._all_players()
+        digest = hashlib.sha1()
+        digest.update(struct.pack("<iib", self.ticks, self.score,
+                                  -1 if self.result is None else int(self.result)))
+        for player in players:
+            digest.update(struct.pack("<4ii", *player.hitbox, player.health))
+        for enemy in self.enemies:
+            digest.update(struct.pack("<4ii", *enemy.hitbox, enemy.health))
+        for player in players:
+            for slot in range(player.bullets.count):
+                digest.update(struct.pack("<4i", *player.bullets.rect(slot)))
+        for index in self.diamonds.indices():
+            rect = self.diamonds.rect(index)
+            digest.update(struct.pack("<2i", rect.x, rect.y))
+        return digest.hexdigest()
+
+    def visible_enemies(self, view):
+        """Enemies whose sprite may overlap view (None for all)"""
+        if view is None:
+            return self.enemies
+        # Sprites are larger than hitboxes; pad the view by a tile
+        return self.enemy_grid.query(view.inflate(self.tile_size * 2, self.tile_size * 2))
+
+    def draw(self, screen, camera=None):
+        """Draw the map and every entity, back to front, culling
+        everything outside the camera's view"""
+        view = camera.rect if camera else None
+        offset = camera.offset if camera else (0, 0)
+        self.game_map.draw(screen, offset)
+        self.diamonds.draw(screen, offset)
+        self.player.bullets.draw(screen, offset, view)
+        for enemy in self.visible_enemies(view):
+            enemy.draw(screen, offset)
+        self.player.draw(screen, offset)
+
+    def run(self, policy, max_ticks, fps=None):
+        """Step until the game ends or max_ticks pass.
+
+        policy(session) returns the keys for each tick. fps=None runs as fast
+        as possible; otherwise ticks are paced to real time.
+        """
+        clock = pygame.time.Clock() if fps else None
+        while self.result is None and self.ticks < max_ticks:
+            self.step(policy(self))
+            if clock:
+                clock.tick(fps)
+        return self.result
+
+class _NearestPlayer:
+    """Player stand-in handed to Enemy.update() in a MultiplayerSession.
+
+    Its hitbox is the one of the live player nearest to enemy, looked up
+    only when the enemy reads it to request a new path.
+    """
+    def __init__(self, players):
+        self.players = players
+        self.enemy = None
+
+    @property
+    def hitbox(self):
+        x, y = self.enemy.hitbox.center
+        return min((player.hitbox for player in self.players),
+                   key=lambda hitbox: abs(hitbox.centerx - x) + abs(hitbox.centery - y))
+
+class MultiplayerSession(GameSession):
+    """A GameSession shared by any number of players, for the game server.
+
+    Players join with add_player() and leave with remove_player() between
+    ticks, and step() takes every player's keys. The game is cooperative:
+    the score is shared, the level is won once anyone reaches the end tile
+    and lost once every player has died. Enemies chase the nearest live
+    player. Nothing advances while no live player is connected.
+    """
+    def __init__(self, level=None, **options):
+        super().__init__(level=level, sound=False, enemy_pool=False, **options)
+        for animation in self.player.animations.values():
+            self.animations.remove(animation)
+        self.player = None
+        self.players = {}  # Player id -> Player, dead ones included
+        self._next_id = 0
+        self._live = []  # Live players, in id order
+        self._nearest = _NearestPlayer(self._live)
+
+    def add_player(self):
+        """Spawn a player on the start tile; returns its id"""
+        player = Player(self.game_map.start_pos[0], self.game_map.start_pos[1], self.tile_size)
+        for animation in player.animations.values():
+            self.animations.add(animation)
+        player_id = self._next_id
+        self._next_id += 1
+        self.players[player_id] = player
+        return player_id
+
+    def remove_player(self, player_id):
+        player = self.players.pop(player_id)
+        for animation in player.animations.values():
+            self.animations.remove(animation)
+
+    def _all_players(self):
+        return list(self.players.values())
+
+    def _live_players(self):
+        return self._live
+
+    def _target(self, enemy):
+        self._nearest.enemy = enemy
+        return self._nearest
+
+    def step(self, inputs):
+        """Advance the game by one tick with each player's keys (player id ->
+        keys; players without an entry stand still); returns self.result"""
+        if self.result is not None:
+            return self.result
+        live = [(player_id, player) for player_id, player in self.players.items() if player.health > 0]
+        if not live:
+            return self.result
+        self.ticks += 1
+        self.collected_rects = []
+        self._live[:] = [player for _, player in live]
+        profiler = self.profiler
+
+        idle = KeyState()
+        for player_id, player in live:
+            self._move_player(player, inputs.get(player_id, idle))
+        if profiler:
+            profiler.mark("input")
+
+        # Bullets of dead players keep flying
+        for player in self.players.values():
+            self._shoot_enemies(player.bullets)
+        if profiler:
+            profiler.mark("bullets")
+
+        self._advance_enemies()
+        if profiler:
+            profiler.mark("enemies")
+            profiler.count("enemy_count", len(self.enemies))
+        self._rebuild_enemy_grid()
+
+        for player in list(self._live):
+            if self._touch_enemies(player):
+                self._live.remove(player)
+        if not self._live:
+            self.result = False
+            return self.result
+        if profiler:
+            profiler.mark("collision")
+
+        for player in self._live:
+            self._collect_diamonds(player)
+        if profiler:
+            profiler.mark("diamonds")
+
+        if any(self._on_end_tile(player) for player in self._live):
+            self.result = True
+        return self.result
+
+if __name__ == "__main__":
+    # Headless throughput check: python session.py [ticks]
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    init_headless()
+    idle = KeyState()
+    total = 0
+    started = time.perf_counter()
+    while total < ticks:
+        session = GameSession(sound=False)
+        session.run(lambda session: idle, ticks - total)
+        total += session.ticks
+    elapsed = time.perf_counter() - started
+    print(f"{total} ticks in {elapsed:.2f}s ({total / elapsed:.0f} ticks/s)")
@@ -1,7 +1,9 @@
 import os
 import pygame
-from bullet import Bullet
+from bullet import BulletPool
 from animation import Animation
+from assets import assets
+from collision import move_and_collide
 
 class Player:
     def __init__(self, x, y, tile_size):
@@ -32,25 +34,25 @@ class Player:
     
         # Movement properties
         self.speed = 4
-        self.bullets = []
+        self.bullets = BulletPool(tile_size)
         self.shoot_cooldown = 0
         self.last_direction = (1, 0)  # Default to facing right
         self.facing_right = True
         self.health = 3
-        self.shoot_sound = pygame.mixer.Sound(os.path.join("sounds", "shoot.wav"))
-        self.shoot_sound.set_volume(0.5)
+        self.shoot_sound = assets.sound(os.path.join("sounds", "shoot.wav"), volume=0.5)
 
     def _load_animation(self, anim_type, frame_count, speed, loop=True):
         """Load complete animation sequence"""
         frames = []
+        mirrored = []
         for i in range(frame_count):
             frame_path = os.path.join("sprites", "player", anim_type, f"{i}.png")
             try:
-                frame = pygame.image.load(frame_path).convert_alpha()
-                frames.append(frame)
+                frames.append(assets.image(frame_path))
+                mirrored.append(assets.variant(frame_path, flip_x=True))
             except:
                 raise SystemExit(f"Missing required sprite: {frame_path}")
-        return Animation(frames, speed, loop)
+        return Animation(frames, speed, loop, mirrored)
 
     def handle_movement(self, keys, game_map):
         dx, dy = 0, 0
@@ -100,18 +102,15 @@ class Player:
         if dir_x == 0 and dir_y == 0:  # Default to right if no direction
             dir_x = 1
     
-        new_bullet = Bullet(bullet_x, bullet_y, dir_x, dir_y, self.tile_size)
-        self.bullets.append(new_bullet)
+        self.bullets.spawn(bullet_x, bullet_y, dir_x, dir_y)
 
-    def draw(self, screen):
-        """Draw the current animation frame"""
-        frame = self.current_anim.current_frame
-        if not self.facing_right:
-            frame = pygame.transform.flip(frame, True, False)
+    def draw(self, screen, offset=(0, 0)):
+        """Draw the current animation frame; returns the area drawn"""
+        frame = self.current_anim.frame(mirrored=not self.facing_right)
         
-        draw_x = self.hitbox.centerx - frame.get_width() // 2
-        draw_y = self.hitbox.centery - frame.get_height() // 2
-        screen.blit(frame, (draw_x, draw_y))
+        draw_x = self.hitbox.centerx - frame.get_width() // 2 - offset[0]
+        draw_y = self.hitbox.centery - frame.get_height() // 2 - offset[1]
+        return screen.blit(frame, (draw_x, draw_y))
 
     def take_damage(self, amount):
         """Handle player taking damage"""
@@ -120,44 +119,4 @@ class Player:
 
     def _move(self, dx, dy, game_map):
         """Handle movement with collision detection"""
-        original_x = self.hitbox.x
-        original_y = self.hitbox.y
-    
-        self.hitbox.x += dx
-        walls = self._get_colliding_walls(game_map)
-        if walls:
-            self.hitbox.x = original_x
-            if dx > 0:
-                self.hitbox.right = min(wall.left for wall in walls)
-            else:
-                self.hitbox.left = max(wall.right for wall in walls)
-    
-        self.hitbox.y += dy
-        walls = self._get_colliding_walls(game_map)
-        if walls:
-            self.hitbox.y = original_y
-            if dy > 0:
-                self.hitbox.bottom = min(wall.top for wall in walls)
-            else:
-                self.hitbox.top = max(wall.bottom for wall in walls)
-
-    def _get_colliding_walls(self, game_map):
-        """Get list of walls the player is colliding with"""
-        walls = []
-        start_x = max(0, self.hitbox.left // self.tile_size - 1)
-        end_x = min(len(game_map.tiles[0]), (self.hitbox.right // self.tile_size) + 1)
-        start_y = max(0, self.hitbox.top // self.tile_size - 1)
-        end_y = min(len(game_map.tiles), (self.hitbox.bottom // self.tile_size) + 1)
-
-        for y in range(start_y, end_y):
-            for x in range(start_x, end_x):
-                if game_map.tile_kinds[game_map.tiles[y][x]].is_solid:
-                    wall_rect = pygame.Rect(
-                        x * self.tile_size,
-                        y * self.tile_size,
-                        self.tile_size,
-                        self.tile_size
-                    )
-                    if self.hitbox.colliderect(wall_rect):
-                        walls.append(wall_rect)
-        return walls
\ No newline at end of file
+        move_and_collide(self.hitbox, dx, dy, game_map)
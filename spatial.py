@@ -0,0 +1,72 @@
+class SpatialHash:
+    """Uniform-grid broadphase answering "who overlaps this rect" queries.
+
+    Objects are registered with a rect (usually their live hitbox) under
+    every cell that rect touches. Rebuild it with clear()/insert() whenever
+    the objects move, or use remove() for objects that never move.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def _cells(self, rect):
+        size = self.cell_size
+        left, top = rect[0], rect[1]
+        for cell_y in range(top // size, (top + rect[3] - 1) // size + 1):
+            for cell_x in range(left // size, (left + rect[2] - 1) // size + 1):
+                yield (cell_x, cell_y)
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, obj, rect):
+        """Register obj under every cell its rect covers"""
+        entry = (obj, rect)
+        for cell in self._cells(rect):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                self.cells[cell] = [entry]
+            else:
+                bucket.append(entry)
+
+    def insert_all(self, objects, rects):
+        """insert() each object with the rect at the same position, with
+        the cell loop inlined for grids rebuilt every tick"""
+        size = self.cell_size
+        cells = self.cells
+        for obj, rect in zip(objects, rects):
+            entry = (obj, rect)
+            left, top = rect[0], rect[1]
+            columns = range(left // size, (left + rect[2] - 1) // size + 1)
+            for cell_y in range(top // size, (top + rect[3] - 1) // size + 1):
+                for cell_x in columns:
+                    bucket = cells.get((cell_x, cell_y))
+                    if bucket is None:
+                        cells[(cell_x, cell_y)] = [entry]
+                    else:
+                        bucket.append(entry)
+
+    def remove(self, obj, rect):
+        """Unregister obj; rect must be the one it was inserted with"""
+        for cell in self._cells(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                bucket[:] = [entry for entry in bucket if entry[0] is not obj]
+                if not bucket:
+                    del self.cells[cell]
+
+    def query(self, rect):
+        """Objects whose rect overlaps rect, each listed once"""
+        found = []
+        seen = set()
+        left, top = rect[0], rect[1]
+        right, bottom = left + rect[2], top + rect[3]
+        for cell in self._cells(rect):
+            for obj, other in self.cells.get(cell, ()):
+                if id(obj) in seen:
+                    continue
+                if (other[0] < right and left < other[0] + other[2] and
+                        other[1] < bottom and top < other[1] + other[3]):
+                    seen.add(id(obj))
+                    found.append(obj)
+        return found
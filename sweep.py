@@ -0,0 +1,209 @@
+"""Balance sweeps: many headless games over a grid of settings.
+
+    python sweep.py [--episodes 100] [--enemies 6 12 24] [--densities 0.1 0.15 0.3]
+                    [--max-ticks 3600] [--workers 4] [--batch 32] [--output results.csv]
+
+Plays --episodes games for each (enemy count, diamond density) pair with
+random inputs, prints win rate, score, ticks and frame cost per pair, and
+optionally writes one row per game as CSV (or JSON for .json).
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from session import GameSession, init_headless, default_tile_kinds, DEFAULT_MAP, ENEMY_SPAWNS, TILE_SIZE
+from map import Map
+from replay import RECORDED_KEYS, decode_keys
+
+DEFAULT_MAX_TICKS = 3600  # One minute of game time
+
+class RandomKeys:
+    """Policy pressing each recorded key with probability press, keeping
+    the keys held for hold ticks"""
+    def __init__(self, seed, hold=10, press=0.4):
+        self.rng = random.Random(seed)
+        self.hold = hold
+        self.press = press
+        self.keys = None
+
+    def __call__(self, session):
+        if self.keys is None or session.ticks % self.hold == 0:
+            self.keys = decode_keys(sum(1 << bit for bit in range(len(RECORDED_KEYS))
+                                        if self.rng.random() < self.press))
+        return self.keys
+
+class ScriptedKeys:
+    """Policy replaying per-tick key masks (a Recording's masks), then idle"""
+    def __init__(self, masks):
+        self.masks = masks
+
+    def __call__(self, session):
+        tick = session.ticks
+        return decode_keys(self.masks[tick] if tick < len(self.masks) else 0)
+
+class Episode:
+    """Settings of one game; policy defaults to RandomKeys(seed)"""
+    def __init__(self, seed, enemies=len(ENEMY_SPAWNS), diamond_density=0.15,
+                 map_path=DEFAULT_MAP, policy=None):
+        self.seed = seed
+        self.enemies = enemies
+        self.diamond_density = diamond_density
+        self.map_path = map_path
+        self.policy = RandomKeys(seed) if policy is None else policy
+
+_floor_cache = {}  # Map path -> (floor tiles, start tile)
+
+def spawn_tiles(map_path, count, rng):
+    """The level's own spawns first, then random floor tiles other than the start"""
+    cached = _floor_cache.get(map_path)
+    if cached is None:
+        game_map = Map(map_path, default_tile_kinds(), TILE_SIZE)
+        start = (game_map.start_pos[0] // TILE_SIZE, game_map.start_pos[1] // TILE_SIZE)
+        floors = [divmod(index, game_map.width)[::-1]
+                  for index, solid in enumerate(game_map.solid) if not solid]
+        game_map.close()
+        cached = _floor_cache[map_path] = (floors, start)
+    floors, start = cached
+    tiles = list(ENEMY_SPAWNS[:count]) if map_path == DEFAULT_MAP else []
+    extra = [tile for tile in floors if tile != start and tile not in tiles]
+    return tiles + rng.sample(extra, min(len(extra), count - len(tiles)))
+
+class _Run:
+    """One episode being played, with its running stats"""
+    def __init__(self, episode):
+        self.episode = episode
+        enemy_tiles = spawn_tiles(episode.map_path, episode.enemies, random.Random(episode.seed))
+        self.session = GameSession(episode.map_path, enemy_tiles=enemy_tiles,
+                                   diamond_density=episode.diamond_density, sound=False, seed=episode.seed)
+        self.policy = episode.policy
+        self.step_time = 0.0
+        self.worst_step = 0.0
+
+    def stats(self):
+        session = self.session
+        episode = self.episode
+        ticks = max(1, session.ticks)
+        return {
+            "seed": episode.seed,
+            "enemies": episode.enemies,
+            "diamond_density": episode.diamond_density,
+            "result": "timeout" if session.result is None else "won" if session.result else "lost",
+            "score": session.score,
+            "ticks": session.ticks,
+            "frame_ms": self.step_time / ticks * 1000,
+            "frame_ms_max": self.worst_step * 1000,
+        }
+
+def run_batch(episodes, max_ticks=DEFAULT_MAX_TICKS):
+    """Play episodes in lockstep, one tick of each in turn, until each ends
+    or reaches max_ticks; returns one stats dict per episode, in order.
+
+    Needs pygame initialised (init_headless()).
+    """
+    runs = [_Run(episode) for episode in episodes]
+    playing = runs
+    clock = time.perf_counter
+    while playing:
+        still_playing = []
+        for run in playing:
+            session = run.session
+            keys = run.policy(session)
+            started = clock()
+            result = session.step(keys)
+            elapsed = clock() - started
+            run.step_time += elapsed
+            if elapsed > run.worst_step:
+                run.worst_step = elapsed
+            if result is None and session.ticks < max_ticks:
+                still_playing.append(run)
+            else:
+                session.close()
+        playing = still_playing
+    return [run.stats() for run in runs]
+
+def _init_worker():
+    init_headless()
+
+def sweep(episodes, max_ticks=DEFAULT_MAX_TICKS, workers=None, batch_size=32):
+    """run_batch() over batches of episodes in worker processes; workers=0
+    plays them all here. Returns the stats of every episode, in order."""
+    batches = [episodes[first:first + batch_size] for first in range(0, len(episodes), batch_size)]
+    if workers == 0:
+        init_headless()
+        return [row for batch in batches for row in run_batch(batch, max_ticks)]
+    # Workers only need the game modules, not this process's state
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker) as executor:
+        results = executor.map(run_batch, batches, [max_ticks] * len(batches))
+        return [row for rows in results for row in rows]
+
+def summarize(rows):
+    """Per (enemies, diamond_density) averages, in first-seen order"""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["enemies"], row["diamond_density"]), []).append(row)
+    summary = []
+    for (enemies, density), group in groups.items():
+        count = len(group)
+        summary.append({
+            "enemies": enemies,
+            "diamond_density": density,
+            "episodes": count,
+            "win_rate": sum(row["result"] == "won" for row in group) / count,
+            "score": sum(row["score"] for row in group) / count,
+            "ticks": sum(row["ticks"] for row in group) / count,
+            "frame_ms": sum(row["frame_ms"] * row["ticks"] for row in group) / max(1, sum(row["ticks"] for row in group)),
+        })
+    return summary
+
+def write_rows(rows, path):
+    """Write stats rows as JSON (.json) or CSV (anything else)"""
+    if path.endswith(".json"):
+        with open(path, "w") as file:
+            json.dump(rows, file, indent=2)
+        return
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=100, help="games per setting")
+    parser.add_argument("--enemies", type=int, nargs="+", default=[len(ENEMY_SPAWNS)])
+    parser.add_argument("--densities", type=float, nargs="+", default=[0.15])
+    parser.add_argument("--map", default=DEFAULT_MAP)
+    parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes; 0 plays every game in this process")
+    parser.add_argument("--batch", type=int, default=32, help="games stepped together per task")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--output", metavar="PATH", help="write one row per game here")
+    args = parser.parse_args()
+
+    episodes = []
+    seed = args.seed
+    for enemies in args.enemies:
+        for density in args.densities:
+            for _ in range(args.episodes):
+                episodes.append(Episode(seed, enemies, density, args.map))
+                seed += 1
+
+    started = time.perf_counter()
+    rows = sweep(episodes, args.max_ticks, args.workers, args.batch)
+    elapsed = time.perf_counter() - started
+    ticks = sum(row["ticks"] for row in rows)
+    print(f"{len(rows)} games, {ticks} ticks in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/s)")
+    print(f"{'enemies':>8}{'density':>9}{'games':>7}{'won':>7}{'score':>8}{'ticks':>8}{'ms/tick':>9}")
+    for group in summarize(rows):
+        print(f"{group['enemies']:>8}{group['diamond_density']:>9.2f}{group['episodes']:>7}"
+              f"{group['win_rate']:>7.0%}{group['score']:>8.1f}{group['ticks']:>8.0f}{group['frame_ms']:>9.3f}")
+    if args.output:
+        write_rows(rows, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import random
+import pygame
+import pytest
+from collision import move_and_collide, sweep_x, sweep_y, wall_spans
+from map import Map
+from session import DEFAULT_MAP, default_tile_kinds
+
+TILE = 32
+
+class GridMap:
+    """Just the fields the collision engine reads, from rows of 0/1"""
+    def __init__(self, rows, tile_size=TILE):
+        self.tile_size = tile_size
+        self.width = len(rows[0])
+        self.height = len(rows)
+        self.solid = bytearray(int(cell) for row in rows for cell in row)
+
+# One-tile-thick wall in column 3, open everywhere else
+THIN_WALL = GridMap(["00010000"] * 4)
+
+def box(tile_x, tile_y, size=20):
+    """(left, top, right, bottom) of a size² box at the top-left of a tile"""
+    left, top = tile_x * TILE, tile_y * TILE
+    return left, top, left + size, top + size
+
+def test_sweep_x_does_not_tunnel_at_high_speed():
+    assert sweep_x(*box(0, 1), 200, THIN_WALL) == (3 * TILE - 20, True)
+
+def test_sweep_x_negative_does_not_tunnel():
+    assert sweep_x(*box(6, 1), -200, THIN_WALL) == (4 * TILE - 6 * TILE, True)
+
+def test_sweep_y_does_not_tunnel_at_high_speed():
+    field = GridMap(["0000", "0000", "1111", "0000", "0000"])
+    assert sweep_y(*box(1, 0), 150, field) == (2 * TILE - 20, True)
+    assert sweep_y(*box(1, 4), -150, field) == (3 * TILE - 4 * TILE, True)
+
+def test_stops_flush_and_stays_flush():
+    dx, hit = sweep_x(*box(2, 1), 30, THIN_WALL)
+    assert hit and 2 * TILE + 20 + dx == 3 * TILE
+    # Touching the wall is not overlapping it: no further move, still a hit
+    left, top, right, bottom = box(2, 1)
+    assert sweep_x(left + dx, top, right + dx, bottom, 5, THIN_WALL) == (0, True)
+    assert sweep_x(left + dx, top, right + dx, bottom, -5, THIN_WALL) == (-5, False)
+
+def test_free_move_is_unchanged():
+    assert sweep_x(*box(0, 1), 40, THIN_WALL) == (40, False)
+    assert sweep_y(*box(5, 0), 60, THIN_WALL) == (60, False)
+    assert sweep_x(*box(5, 1), 0, THIN_WALL) == (0, False)
+
+def test_map_edge_is_open():
+    # Columns and rows outside the map are not solid
+    field = GridMap(["000", "000"])
+    assert sweep_x(*box(2, 0), 100, field) == (100, False)
+    assert sweep_x(*box(0, 0), -100, field) == (-100, False)
+    assert sweep_y(*box(0, 1), 100, field) == (100, False)
+    assert sweep_y(*box(0, 0), -100, field) == (-100, False)
+
+def test_box_outside_the_map_still_hits_walls_inside():
+    field = GridMap(["001", "001"])
+    assert sweep_x(-50, 0, -30, 20, 200, field) == (2 * TILE + 30, True)
+
+def test_wall_spans_merge_runs_and_clip_to_the_map():
+    field = GridMap(["1101", "0111"])
+    assert wall_spans(0, 0, 4 * TILE, 2 * TILE, field) == [
+        (0, 0, 2 * TILE, TILE), (3 * TILE, 0, 4 * TILE, TILE), (TILE, TILE, 4 * TILE, 2 * TILE)]
+    # Box past the right edge: runs stop at the last column
+    assert wall_spans(3 * TILE, TILE, 10 * TILE, 2 * TILE, field) == [(3 * TILE, TILE, 4 * TILE, 2 * TILE)]
+    assert wall_spans(-100, -100, -1, -1, field) == []
+
+def test_move_and_collide_moves_x_then_y():
+    field = GridMap(["0000", "0000", "0010", "0000"])
+    hitbox = pygame.Rect(*box(1, 2)[:2], 20, 20)
+    assert move_and_collide(hitbox, 40, 40, field) == (True, False)
+    assert hitbox.right == 2 * TILE and hitbox.top == 2 * TILE + 40
+    hitbox = pygame.Rect(*box(2, 0)[:2], 20, 20)
+    assert move_and_collide(hitbox, -3, 50, field) == (False, True)
+    assert (hitbox.left, hitbox.bottom) == (2 * TILE - 3, 2 * TILE)
+
+def _old_colliding_walls(hitbox, game_map, tile_size):
+    """Wall scan of Player._get_colliding_walls before the sweep engine"""
+    walls = []
+    start_x = max(0, hitbox.left // tile_size - 1)
+    end_x = min(game_map.width, (hitbox.right // tile_size) + 1)
+    start_y = max(0, hitbox.top // tile_size - 1)
+    end_y = min(game_map.height, (hitbox.bottom // tile_size) + 1)
+    for y in range(start_y, end_y):
+        for x in range(start_x, end_x):
+            if game_map.solid[y * game_map.width + x]:
+                wall_rect = pygame.Rect(x * tile_size, y * tile_size, tile_size, tile_size)
+                if hitbox.colliderect(wall_rect):
+                    walls.append(wall_rect)
+    return walls
+
+def _old_move(hitbox, dx, dy, game_map, tile_size):
+    """Player._move before the sweep engine"""
+    original_x = hitbox.x
+    original_y = hitbox.y
+    hitbox.x += dx
+    walls = _old_colliding_walls(hitbox, game_map, tile_size)
+    if walls:
+        hitbox.x = original_x
+        if dx > 0:
+            hitbox.right = min(wall.left for wall in walls)
+        else:
+            hitbox.left = max(wall.right for wall in walls)
+    hitbox.y += dy
+    walls = _old_colliding_walls(hitbox, game_map, tile_size)
+    if walls:
+        hitbox.y = original_y
+        if dy > 0:
+            hitbox.bottom = min(wall.top for wall in walls)
+        else:
+            hitbox.top = max(wall.bottom for wall in walls)
+
+@pytest.mark.parametrize("size", [12, 19, 31])
+def test_sweep_matches_the_old_wall_loop_on_start_map(size):
+    game_map = Map(DEFAULT_MAP, default_tile_kinds(), TILE)
+    rng = random.Random(size)
+    old = new = None
+    for _ in range(2000):
+        if old is None or rng.random() < 0.02:
+            # Restart somewhere that does not overlap a wall
+            while True:
+                old = pygame.Rect(rng.randrange(game_map.width * TILE - size),
+                                  rng.randrange(game_map.height * TILE - size), size, size)
+                if not _old_colliding_walls(old, game_map, TILE):
+                    break
+            new = old.copy()
+        dx, dy = rng.randint(-8, 8), rng.randint(-8, 8)
+        _old_move(old, dx, dy, game_map, TILE)
+        move_and_collide(new, dx, dy, game_map)
+        assert new == old
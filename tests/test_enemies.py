@@ -0,0 +1,48 @@
+import random
+import pygame
+import pytest
+from enemies import EnemyPool
+from map import Map
+from session import DEFAULT_MAP, TILE_SIZE, GameSession, KeyState, default_tile_kinds
+
+def random_keys(rng):
+    return KeyState(key for key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+                    if rng.random() < 0.4)
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"path_budget": 1},  # Searches spanning ticks, cancelled as enemies die
+    {"path_budget": None},
+    {"dormancy": True},
+])
+@pytest.mark.parametrize("seed", [1, 4, 7])
+def test_pool_matches_enemy_objects_tick_for_tick(headless, seed, options):
+    objects = GameSession(sound=False, seed=seed, **options)
+    pooled = GameSession(sound=False, seed=seed, enemy_pool=True, **options)
+    rng = random.Random(seed)
+    keys = None
+    for tick in range(1500):
+        if tick % 10 == 0:
+            keys = random_keys(rng)
+        result = objects.step(keys)
+        assert pooled.step(keys) == result
+        assert pooled.state_hash() == objects.state_hash(), f"tick {tick}"
+        if result is not None:
+            break
+
+def test_removed_view_is_inert(headless):
+    game_map = Map(DEFAULT_MAP, default_tile_kinds(), TILE_SIZE)
+    pool = EnemyPool(TILE_SIZE, game_map)
+    first, second, last = (pool.spawn(x * TILE_SIZE, TILE_SIZE, random.Random(x)) for x in (1, 5, 9))
+    second.health = 0
+    assert pool.remove_dead() == [second]
+    # The last enemy now holds the removed one's slot; writes must not reach it
+    before = (last.hitbox, last.health, list(last.path), last.awake_until)
+    second.health = 5
+    second.path = [(3, 3)]
+    second.awake_until = 0
+    assert (last.hitbox, last.health, list(last.path), last.awake_until) == before
+    assert first.health == 1 and pool.count == 2
+    for read in (lambda: second.health, lambda: second.path, lambda: second.hitbox, second.tile):
+        with pytest.raises(ReferenceError):
+            read()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import pygame
+import pytest
+from net import (ENEMY_ID, FRAME, INPUT, INPUT_BODY, GameClient, GameServer, _decode_entities,
+                 _encode_entities, _enemy_state, _loopback, _player_state)
+from session import MultiplayerSession
+
+def send(states, known, client):
+    """Encode states against known and apply the result to client; returns
+    the section's size in bytes"""
+    parts = []
+    _encode_entities(states, known, ENEMY_ID, parts, {})
+    data = b"".join(parts)
+    assert _decode_entities(data, 0, client, ENEMY_ID) == len(data)
+    return len(data)
+
+def test_delta_snapshots_round_trip():
+    known, client = {}, {}
+    full = send({7: (100, 200, 1, 0)}, known, client)
+    assert client == {7: [100, 200, 1, 0]}
+    # Small moves cost one byte per axis; nothing is sent for unchanged entities
+    step = send({7: (103, 198, 1, 0)}, known, client)
+    assert client == {7: [103, 198, 1, 0]} and step < full
+    assert send({7: (103, 198, 1, 0)}, known, client) == 4  # Two empty counts
+    send({7: (5000, -40, 1, 1)}, known, client)
+    assert client == {7: [5000, -40, 1, 1]}
+    send({7: (5000, -40, 0, 1), 8: (1, 2, 1, 0)}, known, client)
+    assert client == {7: [5000, -40, 0, 1], 8: [1, 2, 1, 0]}
+    # Entities that leave are dropped on both sides
+    send({8: (1, 2, 1, 0)}, known, client)
+    assert client == {8: [1, 2, 1, 0]} and known == {8: (1, 2, 1, 0)}
+
+def test_encoded_updates_are_shared_between_clients():
+    cache, states = {}, {3: (40, 40, 1, 0)}
+    first, second = [], []
+    _encode_entities(states, {3: (38, 40, 1, 0)}, ENEMY_ID, first, cache)
+    _encode_entities(states, {3: (38, 40, 1, 0)}, ENEMY_ID, second, cache)
+    assert first == second and first[1] is second[1]
+
+async def _serve(session, radius, check):
+    server = GameServer(session, radius=radius)
+    await server.start()
+    try:
+        await check(server)
+    finally:
+        await server.close()
+
+def test_interest_culling(headless):
+    # Start tile (1, 1): one enemy beside it, one across the level
+    session = MultiplayerSession(enemy_tiles=[(2, 1), (17, 17)], seed=1)
+
+    async def check(server):
+        client = GameClient()
+        await client.connect(server.host, server.port)
+        server.tick()
+        await client.receive()
+        player = session.players[client.player_id]
+        reach = server.reach
+        area = pygame.Rect(player.hitbox.centerx - reach, player.hitbox.centery - reach, 2 * reach, 2 * reach)
+        in_range = {server.enemy_ids[enemy] for enemy in session.enemies if area.colliderect(enemy.hitbox)}
+        assert set(client.enemies) == in_range == {0}
+        assert client.enemies[0] == list(_enemy_state(session.enemies[0]))
+        assert client.players == {client.player_id: list(_player_state(player))}
+        await client.close()
+
+    asyncio.run(_serve(session, 2, check))
+
+def test_loopback_bots_mirror_the_server(headless):
+    server, clients = asyncio.run(_loopback(3, 120, seed=0))
+    session = server.session
+    assert session.ticks == 120 or session.result is not None
+    # The server's states of the last tick, kept after the players left
+    players, enemies = server._player_states, server._enemy_states
+    for client in clients:
+        assert client.tick == session.ticks
+        assert client.player == list(players[client.player_id])
+        assert client.enemies and all(state == list(enemies[enemy_id]) for enemy_id, state in client.enemies.items())
+
+@pytest.mark.parametrize("frame", [
+    FRAME.pack(2) + bytes([INPUT, 0]),  # Too short for an input
+    FRAME.pack(INPUT_BODY.size) + bytes([99]) + bytes(INPUT_BODY.size - 1),  # Unknown type
+    FRAME.pack(1 << 30),  # Declares a huge body, never sent
+])
+def test_bad_frames_disconnect_the_client(headless, caplog, frame):
+    session = MultiplayerSession(seed=1)
+
+    async def check(server):
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(frame)
+        await asyncio.wait_for(reader.read(), 5)  # Welcome, then the server hangs up
+        assert server.clients == {} and session.players == {}
+        writer.close()
+
+    with caplog.at_level(logging.WARNING, logger="net"):
+        asyncio.run(_serve(session, 2, check))
+    assert "Disconnecting player 0" in caplog.text
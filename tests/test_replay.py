@@ -0,0 +1,54 @@
+import random
+import pygame
+import pytest
+from replay import Recording, replay
+from session import GameSession, KeyState
+
+def record(seed, ticks=1500, **options):
+    """Play a seeded game with random held keys, fire always pressed;
+    returns the recording and how many enemies died while their path was
+    being searched"""
+    session = GameSession(sound=False, seed=seed, **options)
+    recording = Recording(seed)
+    rng = random.Random(seed)
+    deaths_mid_search = 0
+    for tick in range(ticks):
+        if tick % 8 == 0:
+            keys = KeyState([pygame.K_SPACE] + [key for key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+                                                if rng.random() < 0.4])
+        searching = session.paths._current
+        result = session.step(recording.record(keys))
+        if searching is not None and searching[0] not in session.enemies:
+            deaths_mid_search += 1
+        if result is not None:
+            break
+    recording.final_hash = session.state_hash()
+    return recording, deaths_mid_search
+
+@pytest.mark.parametrize("enemy_pool", [False, True])
+def test_replay_with_deaths_mid_search(headless, tmp_path, enemy_pool):
+    # A one-node budget keeps searches running over many ticks
+    options = {"path_budget": 1, "enemy_pool": enemy_pool}
+    recording, deaths_mid_search = record(4, **options)
+    assert deaths_mid_search > 0
+    path = tmp_path / "game.rec"
+    recording.save(path)
+    loaded = Recording.load(path)
+    assert (loaded.seed, loaded.masks, loaded.final_hash) == (recording.seed, recording.masks, recording.final_hash)
+    session, matches = replay(loaded, **options)
+    assert matches and session.ticks == len(recording.masks)
+
+def test_state_hash_tells_games_apart(headless):
+    recording, _ = record(4, ticks=300)
+    assert replay(recording)[1]
+    recording.seed += 1
+    assert not replay(recording)[1]
+
+def test_load_rejects_other_versions(tmp_path):
+    path = tmp_path / "game.rec"
+    Recording(1, bytearray(3)).save(path)
+    data = bytearray(path.read_bytes())
+    data[4] += 1
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        Recording.load(path)
@@ -0,0 +1,59 @@
+import pygame
+from map import Map
+from pathfinding import SEARCH_SLICE
+from scheduler import PathScheduler
+from session import DEFAULT_MAP, TILE_SIZE, default_tile_kinds
+
+class Walker:
+    """Just what the scheduler reads from an enemy"""
+    def __init__(self, tile):
+        self.hitbox = pygame.Rect(tile[0] * TILE_SIZE, tile[1] * TILE_SIZE, 20, 20)
+        self._tile = tile
+        self.path = None
+
+    def tile(self):
+        return self._tile
+
+def scheduler(budget):
+    game_map = Map(DEFAULT_MAP, default_tile_kinds(), TILE_SIZE)
+    return PathScheduler(game_map.pathfinder, node_budget=budget)
+
+def test_searches_stay_within_the_node_budget():
+    paths = scheduler(10)
+    walkers = [Walker((1, 1)), Walker((18, 18)), Walker((5, 3))]
+    for walker in walkers:
+        paths.request(walker, (16, 1))
+    pathfinder = paths.pathfinder
+    ticks = 0
+    while len(paths):
+        before = pathfinder.nodes_expanded
+        paths.tick()
+        # The budget is checked between slices of a search
+        assert pathfinder.nodes_expanded - before < 10 + SEARCH_SLICE
+        ticks += 1
+    assert ticks > 1
+    assert paths.completed == 3
+    assert all(walker.path for walker in walkers)
+
+def test_cancel_drops_queued_and_running_searches():
+    paths = scheduler(1)
+    running, queued = Walker((1, 1)), Walker((18, 18))
+    paths.request(running, (16, 1))
+    paths.request(queued, (16, 1))
+    paths.tick()
+    assert paths._current[0] is running
+    paths.cancel(running)
+    paths.cancel(queued)
+    assert len(paths) == 0
+    for _ in range(100):
+        paths.tick()
+    assert running.path is None and queued.path is None and paths.completed == 0
+
+def test_repeated_requests_only_update_the_goal():
+    paths = scheduler(10 ** 6)
+    walker = Walker((1, 1))
+    paths.request(walker, (16, 1))
+    paths.request(walker, (1, 3))
+    assert len(paths) == 1
+    paths.tick()
+    assert walker.path and paths.completed == 1
@@ -0,0 +1,73 @@
+import random
+import pygame
+import pytest
+from bench import write_synthetic_map
+from session import GameSession, KeyState
+from spatial import SpatialHash
+from sweep import spawn_tiles
+from visibility import Visibility
+
+class GridMap:
+    """Just the fields Visibility reads, from rows of 0/1"""
+    def __init__(self, rows):
+        self.width = len(rows[0])
+        self.height = len(rows)
+        self.solid = bytearray(int(cell) for row in rows for cell in row)
+
+def test_wall_blocks_line_of_sight():
+    game_map = GridMap(["0001000"] * 7)
+    visibility = Visibility(game_map, radius=5)
+    origin = (1, 3)
+    assert visibility.sees(origin, (2, 3))
+    assert visibility.sees(origin, (3, 3))  # The wall's face
+    assert visibility.sees(origin, (1, 0)) and visibility.sees(origin, (0, 6))
+    assert not any(visibility.sees(origin, (x, y)) for x in range(4, 7) for y in range(7))
+
+def test_single_wall_casts_a_shadow():
+    game_map = GridMap(["0000000"] * 3 + ["0001000"] + ["0000000"] * 3)
+    visibility = Visibility(game_map, radius=6)
+    origin = (1, 3)
+    assert not visibility.sees(origin, (4, 3)) and not visibility.sees(origin, (6, 3))
+    assert visibility.sees(origin, (6, 0)) and visibility.sees(origin, (6, 6))
+
+def test_radius_and_map_edge():
+    visibility = Visibility(GridMap(["0" * 20] * 3), radius=4)
+    assert visibility.sees((2, 1), (6, 1))
+    assert not visibility.sees((2, 1), (7, 1))  # Past the radius
+    assert not visibility.sees((2, 1), (2, -1))  # Outside the map
+
+def test_views_are_cached_until_cleared():
+    game_map = GridMap(["00000"] * 5)
+    visibility = Visibility(game_map, radius=4)
+    assert visibility.sees((0, 2), (4, 2))
+    visibility.sees((0, 2), (4, 0))
+    assert visibility.views_computed == 1
+    game_map.solid[2 * 5 + 2] = 1
+    visibility.clear()
+    assert not visibility.sees((0, 2), (4, 2))
+    assert visibility.views_computed == 2
+
+def grid_contents(grid):
+    return {cell: sorted((id(obj), tuple(rect)) for obj, rect in bucket)
+            for cell, bucket in grid.cells.items() if bucket}
+
+@pytest.mark.parametrize("enemy_pool", [False, True])
+def test_incremental_enemy_grid_matches_a_rebuild(headless, tmp_path, enemy_pool):
+    map_path = str(tmp_path / "level.map")
+    write_synthetic_map(map_path, 60, 60, seed=3)
+    enemy_tiles = spawn_tiles(map_path, 40, random.Random(3))
+    session = GameSession(map_path, enemy_tiles=enemy_tiles, sound=False, seed=3,
+                          dormancy=True, enemy_pool=enemy_pool)
+    rng = random.Random(3)
+    keys = None
+    for tick in range(1500):
+        if tick % 10 == 0:
+            keys = KeyState(key for key in (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+                            if rng.random() < 0.5)
+        if session.step(keys) is not None:
+            break
+        rebuilt = SpatialHash(session.enemy_grid.cell_size)
+        for enemy in session.enemies:
+            rebuilt.insert(enemy, enemy.hitbox)
+        assert grid_contents(session.enemy_grid) == grid_contents(rebuilt), f"tick {tick}"
+    assert tick > 100
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+VISION_RADIUS = 12  # Tiles a line of sight reaches
+VIEW_CACHE_SIZE = 1024  # Views kept by Visibility
+
+# Transforms mapping octant 0 onto each of the eight octants: (xx, xy, yx, yy)
+_OCTANTS = [
+    (1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+    (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1),
+]
+
+class Visibility:
+    """Line of sight between tiles, by recursive shadowcasting over the
+    map's solidity mask.
+
+    view(tile) is a bitmap of the (2 * radius + 1)² window centred on tile,
+    with 1 on every tile visible from it (walls included, so their faces
+    can be seen). Views are computed on first use and kept in an LRU cache,
+    so a player standing still or walking back and forth costs nothing.
+    """
+    def __init__(self, game_map, radius=VISION_RADIUS, cache_size=VIEW_CACHE_SIZE):
+        self.game_map = game_map
+        self.radius = radius
+        self.side = 2 * radius + 1
+        self.cache_size = cache_size
+        self._views = OrderedDict()  # Tile -> bitmap
+        self.views_computed = 0  # Running total, read by the frame profiler
+
+    def clear(self):
+        """Forget every view, e.g. after a tile changed"""
+        self._views.clear()
+
+    def view(self, tile):
+        """Bitmap of the tiles visible from tile; index it with offset()"""
+        window = self._views.get(tile)
+        if window is not None:
+            self._views.move_to_end(tile)
+            return window
+        window = bytearray(self.side * self.side)
+        radius = self.radius
+        window[radius * self.side + radius] = 1
+        for transform in _OCTANTS:
+            self._cast(window, tile, 1, 1.0, 0.0, *transform)
+        self._views[tile] = window
+        if len(self._views) > self.cache_size:
+            self._views.popitem(last=False)
+        self.views_computed += 1
+        return window
+
+    def offset(self, origin, tile):
+        """Index of tile in the view from origin, or -1 if out of range"""
+        radius = self.radius
+        dx = tile[0] - origin[0] + radius
+        dy = tile[1] - origin[1] + radius
+        if 0 <= dx < self.side and 0 <= dy < self.side:
+            return dy * self.side + dx
+        return -1
+
+    def sees(self, origin, tile):
+        """True if tile is in the line of sight of origin"""
+        index = self.offset(origin, tile)
+        return index >= 0 and self.view(origin)[index] == 1
+
+    def _cast(self, window, origin, row, start, end, xx, xy, yx, yy):
+        """Light one octant from row outwards between slopes start and end,
+        recursing past each wall that splits the light"""
+        if start < end:
+            return
+        game_map = self.game_map
+        width, height, solid = game_map.width, game_map.height, game_map.solid
+        radius = self.radius
+        side = self.side
+        radius_squared = radius * radius
+        origin_x, origin_y = origin
+        new_start = start
+        for distance in range(row, radius + 1):
+            dx, dy = -distance - 1, -distance
+            blocked = False
+            while dx <= 0:
+                dx += 1
+                left_slope = (dx - 0.5) / (dy + 0.5)
+                right_slope = (dx + 0.5) / (dy - 0.5)
+                if start < right_slope:
+                    continue
+                if end > left_slope:
+                    break
+                # Octant coordinates to map tile
+                offset_x = dx * xx + dy * xy
+                offset_y = dx * yx + dy * yy
+                x, y = origin_x + offset_x, origin_y + offset_y
+                inside = 0 <= x < width and 0 <= y < height
+                if inside and dx * dx + dy * dy <= radius_squared:
+                    window[(offset_y + radius) * side + offset_x + radius] = 1
+                opaque = not inside or solid[y * width + x]
+                if blocked:
+                    if opaque:
+                        new_start = right_slope
+                    else:
+                        blocked = False
+                        start = new_start
+                elif opaque and distance < radius:
+                    blocked = True
+                    self._cast(window, origin, distance + 1, start, left_slope, xx, xy, yx, yy)
+                    new_start = right_slope
+            if blocked:
+                break